@@ -1,12 +1,97 @@
-from dash import Dash, html, dcc, Input, Output, State, ALL, ctx
+from dash import Dash, DiskcacheManager, html, dcc, Input, Output, State, ALL, ctx, ClientsideFunction
 from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+import diskcache
+from flask import jsonify, request
+import numpy as np
 import os
+import re
+import shutil
+import uuid
+from functools import lru_cache
+from utils.catalog import ScenarioIndex
+from utils.figures import compact_figure, decimate, typed_array
+from utils.images import DERIVED_DIR, MIME_TYPES, srcset
+from utils.jobs import JOB_RESULT_EXPIRE, JOBS_DIR, cache_lock, job_slots, lower_priority
+from utils.metrics import init_metrics
+from utils.plotter import compute_plot_data, build_figures
+from utils.store import RESULTS_DIR, list_scenarios, read_scenario, scenario_path
+from utils.tables import STANDARD_LEVELS, default_tables, lookup_intervals
+from precomputed_data import (
+    MANIFEST_PATH,
+    PLOT_DIR,
+    code_digest,
+    is_up_to_date,
+    load_manifest,
+    publish_scenario,
+    render_scenario,
+    scenario_digest,
+    staged_results_dir,
+    staging_dir,
+)
+
+# Background jobs (scenario submissions) run in separate processes, queued in an on-disk cache.
+# Each submission gets its own job key: Dash keys jobs by their inputs, so two identical
+# submissions would otherwise consume each other's progress and result. Identical work is
+# deduplicated inside the job instead (see submit_scenario).
+job_cache = diskcache.Cache(JOBS_DIR)
+job_manager = DiskcacheManager(job_cache, cache_by=[lambda: uuid.uuid4().hex], expire=JOB_RESULT_EXPIRE)
 
 # Initialize the app
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+app = Dash(
+    __name__,
+    external_stylesheets=[dbc.themes.BOOTSTRAP],
+    suppress_callback_exceptions=True,
+    background_callback_manager=job_manager,
+)
 server = app.server
 
+# Scenario category pages: route -> (title, file name keyword)
+SCENARIO_ROUTES = {
+    "/baseline": ("Baseline Scenarios", "baseline"),
+    "/low-default": ("Low Default Portfolio Scenarios", "low default"),
+    "/large-sample": ("Large Sample Scenarios", "large sample"),
+}
+
+# Number of (n, k, confidence level) results kept by the custom portfolio page
+CUSTOM_CACHE_SIZE = 256
+
+# Client-side mode: the modal and its redraws run in the browser from data shipped once per page
+CLIENTSIDE_MODAL = os.environ.get("CLIENTSIDE_MODAL", "0") == "1"
+
+# compute_intervals columns drawn on each plot, and the trace style of the plot
+PLOT_BOUNDS = {
+    "normal": [("wald_lower", "wald_upper")],
+    "exact": [("cp_lower", "cp_upper")],
+    "bayesian": [("jeffreys_lower", "jeffreys_upper"), ("hdr_lower", "hdr_upper")],
+}
+PLOT_STYLES = {
+    "normal": {"color": "blue", "mode": "lines"},
+    "exact": {"color": "green", "mode": "markers+lines"},
+    "bayesian": {"color": "red", "mode": "lines"},
+}
+
+# Largest portfolio size accepted by the custom portfolio and scenario submission forms
+MAX_N = 10_000_000
+
+# Number of cards per gallery page
+PAGE_SIZE = 12
+
+# Gallery sort options: value -> (index field, descending)
+SORT_OPTIONS = {
+    "name": ("name", False),
+    "n": ("n", False),
+    "-n": ("n", True),
+    "p": ("p", False),
+    "-p": ("p", True),
+}
+
+# Rendered width of a card image, used to pick a thumbnail from the srcset
+CARD_IMAGE_SIZES = "(max-width: 768px) 100vw, 33vw"
+
+# Plot catalog, scanned once at startup and rebuilt only when the directory or manifest changes
+scenario_index = ScenarioIndex(PLOT_DIR, categories=[keyword for _, keyword in SCENARIO_ROUTES.values()])
+
 # Helper functions
 def create_home_page():
     """Creates the welcome page."""
@@ -84,6 +169,24 @@ def create_home_page():
                                 ),
                                 width=4,
                             ),
+                            dbc.Col(
+                                dbc.Button(
+                                    "Custom Portfolio",
+                                    href="/custom",
+                                    color="primary",
+                                    className="btn-block my-2",
+                                ),
+                                width=4,
+                            ),
+                            dbc.Col(
+                                dbc.Button(
+                                    "Add a Scenario",
+                                    href="/submit",
+                                    color="primary",
+                                    className="btn-block my-2",
+                                ),
+                                width=4,
+                            ),
                         ],
                         className="justify-content-center mt-4",
                     ),
@@ -95,32 +198,219 @@ def create_home_page():
     )
 
 
-def create_scenario_window(title, image_dir, keyword):
-    """Creates a layout for a specific scenario category."""
+@lru_cache(maxsize=None)
+def load_stored_scenario(name, index_version):
+    """Memory-maps a scenario of the result store, once per version of the scenario index."""
+    if not os.path.isdir(scenario_path(name, RESULTS_DIR)):
+        return None
+    return read_scenario(name, RESULTS_DIR)
+
+
+def preload():
+    """
+    Builds the scenario index and maps the result store and the interval tables.
+
+    Runs at import time, so a server importing the app before forking its
+    workers (gunicorn preload_app) shares this state between them.
+    """
+    scenario_index.refresh()
+    for name in list_scenarios(RESULTS_DIR):
+        load_stored_scenario(name, scenario_index.version)
+    default_tables().preload()
+
+
+@lru_cache(maxsize=None)
+def scenario_curve(scenario, method, index_version):
+    """Decimated curve of a stored scenario plot as typed arrays, serialized once per index version."""
+    data = load_stored_scenario(scenario, index_version)
+    x, y = data["curves"][method]
+    anchors = sorted(bound for bounds in (data["ci_" + method], data.get("hdr_" + method, ())) for bound in bounds)
+    indices = decimate(x, y, anchors=anchors)
+    return {"x": typed_array(x[indices]), "y": typed_array(y[indices])}
+
+
+def create_page_data(entries, levels=STANDARD_LEVELS):
+    """Collects the compact interval tables and curves of a page for the client-side modal."""
+    stored = {}
+    for entry in entries:
+        scenario = entry["scenario"]
+        if scenario not in stored:
+            data = load_stored_scenario(scenario, scenario_index.version)
+            if data is not None:
+                stored[scenario] = data
+
+    # Intervals of every stored scenario at every level in one vectorized call (table lookups for standard sizes)
+    names = list(stored)
+    if names:
+        table = lookup_intervals(
+            np.repeat([stored[name]["n"] for name in names], len(levels)),
+            np.repeat([stored[name]["k"] for name in names], len(levels)),
+            np.tile(levels, len(names)),
+        )
+
+    page_data = {}
+    for entry in entries:
+        item = {"name": entry["name"], "path": entry["path"]}
+        data = stored.get(entry["scenario"])
+        # Degenerate plots (no curve, e.g. the normal approximation at p_hat = 0) keep the rendered image
+        if data is not None and entry["method"] in PLOT_BOUNDS and len(data["curves"][entry["method"]][0]):
+            offset = names.index(entry["scenario"]) * len(levels)
+            item.update(PLOT_STYLES[entry["method"]])
+            item.update(scenario_curve(entry["scenario"], entry["method"], scenario_index.version))
+            item.update({
+                "zoom": list(data["zoom"]),
+                "levels": {
+                    str(level): [
+                        [float(table[lower][offset + i]), float(table[upper][offset + i])]
+                        for lower, upper in PLOT_BOUNDS[entry["method"]]
+                    ]
+                    for i, level in enumerate(levels)
+                },
+            })
+        page_data[entry["file"]] = item
+    return page_data
+
+
+def create_card_image(entry):
+    """Creates the clickable card image, using the thumbnails when they exist."""
+    style = {"maxHeight": "200px", "cursor": "pointer"}
+    image_id = {"type": "image", "index": entry["file"]}
+    derivatives = entry.get("derivatives")
+    if not derivatives or "jpeg" not in derivatives:
+        return html.Img(src=entry["path"], className="img-fluid", style=style, id=image_id)
+
+    prefix = entry["path"].rsplit("/", 1)[0]
+    smallest = min(derivatives["jpeg"].items(), key=lambda item: int(item[0]))[1]
+    sources = [
+        html.Source(type=MIME_TYPES[fmt], srcSet=srcset(derivatives, fmt, prefix), sizes=CARD_IMAGE_SIZES)
+        for fmt in derivatives if fmt != "jpeg"
+    ]
+    return html.Picture(
+        sources
+        + [
+            html.Img(
+                src=f"{prefix}/{smallest}",
+                srcSet=srcset(derivatives, "jpeg", prefix),
+                sizes=CARD_IMAGE_SIZES,
+                className="img-fluid",
+                style=style,
+                id=image_id,
+            )
+        ]
+    )
+
+
+def create_modal():
+    """Creates the modal showing an enlarged plot."""
+    body = [html.Img(id="modal-image", className="img-fluid")]
+    if CLIENTSIDE_MODAL:
+        # Redrawn in the browser for the selected confidence level
+        body.append(
+            html.Div(
+                [
+                    dcc.Dropdown(
+                        id="modal-level",
+                        options=[{"label": f"{level * 100:g}%", "value": level} for level in STANDARD_LEVELS],
+                        value=0.95,
+                        clearable=False,
+                        className="my-3",
+                    ),
+                    dcc.Graph(id="modal-graph"),
+                ],
+                id="modal-graph-container",
+                style={"display": "none"},
+            )
+        )
+    return dbc.Modal(
+        [
+            dbc.ModalHeader(dbc.ModalTitle(id="modal-title")),
+            dbc.ModalBody(body),
+        ],
+        id="modal",
+        is_open=False,
+        size="lg",
+    )
+
+
+@lru_cache(maxsize=1024)
+def create_gallery_page(keyword, page, sort_by, method, n_min, n_max, p_min, p_max, index_version):
+    """
+    Builds the cards of one gallery page, filtered and sorted on the server.
+
+    Returns (cards, number of pages, page entries); memoized per index version.
+    """
+    field, descending = SORT_OPTIONS.get(sort_by, SORT_OPTIONS["name"])
+    entries = scenario_index.query(keyword, method or None, (n_min, n_max), field, descending, (p_min, p_max))
+    n_pages = max(1, -(-len(entries) // PAGE_SIZE))
+    page = min(max(1, page), n_pages)
+    page_entries = entries[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+
     scenario_cards = []
-    for image_file in os.listdir(image_dir):
-        if image_file.endswith(".jpeg") and keyword in image_file.lower():
-            scenario_name = image_file.replace("_", " ").replace(".jpeg", "").title()
-            image_path = f"/{image_dir}/{image_file}"
-            scenario_cards.append(
-                dbc.Col(
-                    dbc.Card(
-                        dbc.CardBody(
-                            [
-                                html.H5(scenario_name, className="card-title"),
-                                html.Img(
-                                    src=image_path,
-                                    className="img-fluid",
-                                    style={"maxHeight": "200px", "cursor": "pointer"},
-                                    id={"type": "image", "index": image_file},
-                                ),
-                            ]
-                        ),
-                        className="mb-4",
+    for entry in page_entries:
+        scenario_cards.append(
+            dbc.Col(
+                dbc.Card(
+                    dbc.CardBody(
+                        [
+                            html.H5(entry["name"], className="card-title"),
+                            create_card_image(entry),
+                        ]
                     ),
-                    width=4,
-                )
+                    className="mb-4",
+                ),
+                width=4,
             )
+        )
+    if not scenario_cards:
+        scenario_cards = [html.P("No scenario matches these filters.", className="text-center")]
+    return dbc.Row(scenario_cards, className="g-4"), n_pages, tuple(entry["file"] for entry in page_entries)
+
+
+def create_gallery_controls():
+    """Creates the sort, filter and pagination controls of a gallery."""
+    return dbc.Row(
+        [
+            dbc.Col(
+                dcc.Dropdown(
+                    id="gallery-sort",
+                    options=[
+                        {"label": "Sort by name", "value": "name"},
+                        {"label": "n ascending", "value": "n"},
+                        {"label": "n descending", "value": "-n"},
+                        {"label": "p ascending", "value": "p"},
+                        {"label": "p descending", "value": "-p"},
+                    ],
+                    value="name",
+                    clearable=False,
+                ),
+                width=2,
+            ),
+            dbc.Col(
+                dcc.Dropdown(
+                    id="gallery-method",
+                    options=[
+                        {"label": "All methods", "value": ""},
+                        {"label": "Normal approximation", "value": "normal"},
+                        {"label": "Exact binomial", "value": "exact"},
+                        {"label": "Bayesian", "value": "bayesian"},
+                    ],
+                    value="",
+                    clearable=False,
+                ),
+                width=2,
+            ),
+            dbc.Col(dbc.Input(id="gallery-n-min", type="number", min=1, placeholder="min n", debounce=True), width=2),
+            dbc.Col(dbc.Input(id="gallery-n-max", type="number", min=1, placeholder="max n", debounce=True), width=2),
+            dbc.Col(dbc.Input(id="gallery-p-min", type="number", min=0, max=1, step="any", placeholder="min p", debounce=True), width=2),
+            dbc.Col(dbc.Input(id="gallery-p-max", type="number", min=0, max=1, step="any", placeholder="max p", debounce=True), width=2),
+        ],
+        className="justify-content-center mb-4",
+    )
+
+
+def create_scenario_window(title, keyword):
+    """Creates a layout for a specific scenario category, showing the first gallery page."""
+    gallery, n_pages, page_files = create_gallery_page(keyword, 1, "name", "", None, None, None, None, scenario_index.version)
 
     return dbc.Container(
         [
@@ -139,24 +429,201 @@ def create_scenario_window(title, image_dir, keyword):
                         className="text-center text-dark mb-4 fw-bold",
                         style={"color": "#404140"},
                     ),
-                    dbc.Row(scenario_cards, className="g-4"),
+                    create_gallery_controls(),
+                    html.Div(gallery, id="gallery"),
+                    dbc.Pagination(
+                        id="gallery-pagination",
+                        max_value=n_pages,
+                        active_page=1,
+                        fully_expanded=False,
+                        className="justify-content-center",
+                    ),
+                    dcc.Store(id="gallery-keyword", data=keyword),
                 ],
                 className="mb-4",
             ),
-            dbc.Modal(
+            create_modal(),
+        ]
+        + ([dcc.Store(id="page-data", data=create_page_data([scenario_index.find(file) for file in page_files])), dcc.Store(id="modal-selected")] if CLIENTSIDE_MODAL else []),
+        fluid=True,
+    )
+
+
+def create_custom_page():
+    """Creates the page computing the intervals of a user-defined portfolio."""
+    return dbc.Container(
+        [
+            dbc.NavbarSimple(
+                brand="Custom Portfolio",
+                children=[
+                    dbc.NavLink("Back to Home", href="/", className="text-white"),
+                ],
+                color="#bd8e43",
+                dark=True,
+            ),
+            html.P(
+                "Enter the portfolio size, the observed number of defaults and a confidence level.",
+                className="text-center text-dark my-4 fw-bold",
+            ),
+            dbc.Row(
                 [
-                    dbc.ModalHeader(dbc.ModalTitle(id="modal-title")),
-                    dbc.ModalBody(html.Img(id="modal-image", className="img-fluid")),
+                    dbc.Col(
+                        [dbc.Label("Number of obligors (n)"), dbc.Input(id="custom-n", type="number", min=1, max=MAX_N, step=1, value=1000)],
+                        width=3,
+                    ),
+                    dbc.Col(
+                        [dbc.Label("Number of defaults (k)"), dbc.Input(id="custom-k", type="number", min=0, step=1, value=5)],
+                        width=3,
+                    ),
+                    dbc.Col(
+                        [dbc.Label("Confidence level"), dbc.Input(id="custom-level", type="number", min=0.5, max=0.9999, step=0.001, value=0.95)],
+                        width=3,
+                    ),
+                    dbc.Col(
+                        dbc.Button("Compute", id="custom-compute", color="primary", className="mt-4"),
+                        width=3,
+                    ),
                 ],
-                id="modal",
-                is_open=False,
-                size="lg",
+                className="justify-content-center mb-4",
             ),
+            dcc.Loading(html.Div(id="custom-results")),
         ],
         fluid=True,
     )
 
 
+@lru_cache(maxsize=CUSTOM_CACHE_SIZE)
+def compute_custom_results(n, k, confidence_level):
+    """Computes the intervals and compact figures of a custom portfolio, cached by (n, k, level)."""
+    data = compute_plot_data(n, k / n, confidence_level, k=k)
+    fig_normal, fig_exact, fig_bayesian = (compact_figure(fig) for fig in build_figures(data))
+    rows = [
+        ("Normal approximation", data["ci_normal"]),
+        ("Exact (Clopper-Pearson)", data["ci_exact"]),
+        ("Bayesian equal-tailed", data["ci_bayesian"]),
+        ("Bayesian HDR", data["hdr_bayesian"]),
+    ]
+    table = dbc.Table(
+        [html.Thead(html.Tr([html.Th("Method"), html.Th("Lower"), html.Th("Upper")]))]
+        + [html.Tbody([html.Tr([html.Td(name), html.Td(f"{lower:.6f}"), html.Td(f"{upper:.6f}")]) for name, (lower, upper) in rows])],
+        bordered=True,
+        className="mb-4",
+    )
+    return html.Div(
+        [
+            html.H5(f"p̂ = {k}/{n} = {data['p_hat']:.6f}", className="text-center mb-3"),
+            table,
+            dbc.Row([dbc.Col(dcc.Graph(figure=fig), width=4) for fig in (fig_normal, fig_exact, fig_bayesian)]),
+        ]
+    )
+
+
+def create_submit_page():
+    """Creates the page submitting a new scenario to the gallery."""
+    return dbc.Container(
+        [
+            dbc.NavbarSimple(
+                brand="Add a Scenario",
+                children=[
+                    dbc.NavLink("Back to Home", href="/", className="text-white"),
+                ],
+                color="#bd8e43",
+                dark=True,
+            ),
+            html.P(
+                "The scenario is computed in the background and added to the gallery of its category when done.",
+                className="text-center text-dark my-4 fw-bold",
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Label("Category"),
+                            dcc.Dropdown(
+                                id="submit-category",
+                                options=[{"label": title, "value": keyword} for title, keyword in SCENARIO_ROUTES.values()],
+                                value="baseline",
+                                clearable=False,
+                            ),
+                        ],
+                        width=3,
+                    ),
+                    dbc.Col([dbc.Label("Name"), dbc.Input(id="submit-name", type="text", placeholder="e.g. 3")], width=2),
+                    dbc.Col([dbc.Label("Number of trials (n)"), dbc.Input(id="submit-n", type="number", min=1, max=MAX_N, step=1, value=1000)], width=2),
+                    dbc.Col([dbc.Label("Probability (p)"), dbc.Input(id="submit-p", type="number", min=0, max=1, step=0.001, value=0.01)], width=2),
+                    dbc.Col(
+                        [dbc.Label("Confidence level"), dbc.Input(id="submit-level", type="number", min=0.5, max=0.9999, step=0.001, value=0.95)],
+                        width=2,
+                    ),
+                ],
+                className="justify-content-center mb-3",
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(dbc.Button("Submit", id="submit-button", color="primary"), width="auto"),
+                    dbc.Col(dbc.Button("Cancel", id="submit-cancel", color="secondary", disabled=True), width="auto"),
+                ],
+                className="justify-content-center mb-3",
+            ),
+            dbc.Progress(id="submit-progress", value=0, striped=True, animated=True, className="mb-3", style={"display": "none"}),
+            html.Div(id="submit-status"),
+        ],
+        fluid=True,
+    )
+
+
+def submission_error(scenario, category):
+    """Validates a submitted scenario and its gallery category; returns an error message or None."""
+    n, p, confidence_level, name = scenario["n"], scenario["p"], scenario["confidence_level"], scenario["scenario_name"]
+    if n is None or p is None or confidence_level is None or not name:
+        return "Please fill in the name, n, p and the confidence level."
+    if category not in [keyword for _, keyword in SCENARIO_ROUTES.values()]:
+        return "Please choose one of the gallery categories."
+    if not re.fullmatch(r"[a-z0-9 .-]{1,60}", name):
+        return "The name may only contain letters, digits, spaces, dots and dashes."
+    if n != int(n) or not 1 <= n <= MAX_N:
+        return f"n must be an integer between 1 and {MAX_N:,}."
+    if not 0 < p < 1:
+        return "p must lie strictly between 0 and 1."
+    if not 0 < confidence_level < 1:
+        return "The confidence level must lie strictly between 0 and 1."
+    return None
+
+
+@lru_cache(maxsize=None)
+def cached_page(pathname, index_version):
+    """Memoizes the layout of a route for a given version of the scenario index."""
+    if pathname in SCENARIO_ROUTES:
+        return create_scenario_window(*SCENARIO_ROUTES[pathname])
+    if pathname == "/custom":
+        return create_custom_page()
+    if pathname == "/submit":
+        return create_submit_page()
+    return create_home_page()
+
+
+@server.after_request
+def add_cache_headers(response):
+    """Lets browsers and proxies cache the content-hashed plot derivatives forever."""
+    if request.path.startswith(f"/assets/plots/{DERIVED_DIR}/") and response.status_code == 200:
+        response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+@server.route("/healthz")
+def healthz():
+    """Health check for the load balancer."""
+    return jsonify(status="ok", pid=os.getpid(), plots=len(scenario_index.entries()), index_version=scenario_index.version)
+
+
+# Per-callback latency, payload size and cache hit rates on /metrics
+metrics = init_metrics(app)
+metrics.register_cache("page_layout", cached_page)
+metrics.register_cache("gallery_page", create_gallery_page)
+metrics.register_cache("custom_results", compute_custom_results)
+metrics.register_cache("scenario_curve", scenario_curve)
+
+
 # Define the app layout
 app.layout = html.Div(
     [
@@ -173,21 +640,44 @@ app.layout = html.Div(
 )
 def display_page(pathname):
     """Switches between pages."""
-    if pathname == "/baseline":
-        return create_scenario_window("Baseline Scenarios", "assets/plots", "baseline")
-    elif pathname == "/low-default":
-        return create_scenario_window("Low Default Portfolio Scenarios", "assets/plots", "low default")
-    elif pathname == "/large-sample":
-        return create_scenario_window("Large Sample Scenarios", "assets/plots", "large sample")
-    else:
-        return create_home_page()
+    if scenario_index.refresh():
+        metrics.clear_cache("page_layout")
+        metrics.clear_cache("gallery_page")
+        load_stored_scenario.cache_clear()
+        metrics.clear_cache("scenario_curve")
+    if pathname not in SCENARIO_ROUTES and pathname not in ("/custom", "/submit"):
+        pathname = "/"
+    return cached_page(pathname, scenario_index.version)
 
 
 @app.callback(
-    [Output("modal", "is_open"), Output("modal-title", "children"), Output("modal-image", "src")],
-    [Input({"type": "image", "index": ALL}, "n_clicks")],
-    [State("modal", "is_open")],
+    [Output("gallery", "children"), Output("gallery-pagination", "max_value"), Output("gallery-pagination", "active_page")]
+    + ([Output("page-data", "data")] if CLIENTSIDE_MODAL else []),
+    [
+        Input("gallery-pagination", "active_page"),
+        Input("gallery-sort", "value"),
+        Input("gallery-method", "value"),
+        Input("gallery-n-min", "value"),
+        Input("gallery-n-max", "value"),
+        Input("gallery-p-min", "value"),
+        Input("gallery-p-max", "value"),
+    ],
+    [State("gallery-keyword", "data")],
+    prevent_initial_call=True,
 )
+def update_gallery(active_page, sort_by, method, n_min, n_max, p_min, p_max, keyword):
+    """Sends the requested gallery page only; changing a filter goes back to the first page."""
+    if ctx.triggered_id != "gallery-pagination":
+        active_page = 1
+    gallery, n_pages, page_files = create_gallery_page(
+        keyword, active_page or 1, sort_by, method, n_min, n_max, p_min, p_max, scenario_index.version
+    )
+    outputs = [gallery, n_pages, min(active_page or 1, n_pages)]
+    if CLIENTSIDE_MODAL:
+        outputs.append(create_page_data([scenario_index.find(file) for file in page_files]))
+    return outputs
+
+
 def toggle_modal(n_clicks, is_open):
     """Toggles the modal for displaying enlarged images."""
     if not any(n_clicks):
@@ -195,13 +685,133 @@ def toggle_modal(n_clicks, is_open):
 
     triggered_id = ctx.triggered_id
     if triggered_id:
-        image_file = triggered_id["index"]
-        image_name = image_file.replace("_", " ").replace(".jpeg", "").title()
-        image_path = f"/assets/plots/{image_file}"
-        return not is_open, image_name, image_path
+        entry = scenario_index.find(triggered_id["index"])
+        if entry is None:
+            raise PreventUpdate
+        return not is_open, entry["name"], entry["path"]
     return is_open, None, None
 
 
-# Run the app
+if CLIENTSIDE_MODAL:
+    # Both callbacks run in the browser (assets/clientside.js) from the page-data store
+    app.clientside_callback(
+        ClientsideFunction(namespace="modal", function_name="toggle_modal"),
+        [
+            Output("modal", "is_open"),
+            Output("modal-title", "children"),
+            Output("modal-image", "src"),
+            Output("modal-image", "style"),
+            Output("modal-selected", "data"),
+        ],
+        [Input({"type": "image", "index": ALL}, "n_clicks")],
+        [State("modal", "is_open"), State("page-data", "data")],
+    )
+    app.clientside_callback(
+        ClientsideFunction(namespace="modal", function_name="draw_figure"),
+        [Output("modal-graph", "figure"), Output("modal-graph-container", "style")],
+        [Input("modal-level", "value"), Input("modal-selected", "data")],
+        [State("page-data", "data")],
+    )
+else:
+    app.callback(
+        [Output("modal", "is_open"), Output("modal-title", "children"), Output("modal-image", "src")],
+        [Input({"type": "image", "index": ALL}, "n_clicks")],
+        [State("modal", "is_open")],
+    )(toggle_modal)
+
+
+@app.callback(
+    Output("custom-results", "children"),
+    Input("custom-compute", "n_clicks"),
+    [State("custom-n", "value"), State("custom-k", "value"), State("custom-level", "value")],
+    prevent_initial_call=True,
+)
+def update_custom_results(n_clicks, n, k, confidence_level):
+    """Computes the intervals of the custom portfolio."""
+    if n is None or k is None or confidence_level is None:
+        return dbc.Alert("Please fill in n, k and the confidence level.", color="warning")
+    if n != int(n) or k != int(k) or not 0 <= k <= n or not 1 <= n <= MAX_N:
+        return dbc.Alert(f"n must be an integer between 1 and {MAX_N:,} and k an integer between 0 and n.", color="warning")
+    if not 0 < confidence_level < 1:
+        return dbc.Alert("The confidence level must lie strictly between 0 and 1.", color="warning")
+    return compute_custom_results(int(n), int(k), float(confidence_level))
+
+
+@app.callback(
+    Output("submit-status", "children"),
+    Input("submit-button", "n_clicks"),
+    [
+        State("submit-category", "value"),
+        State("submit-name", "value"),
+        State("submit-n", "value"),
+        State("submit-p", "value"),
+        State("submit-level", "value"),
+    ],
+    background=True,
+    running=[
+        (Output("submit-button", "disabled"), True, False),
+        (Output("submit-cancel", "disabled"), False, True),
+        (Output("submit-progress", "style"), {}, {"display": "none"}),
+    ],
+    progress=[Output("submit-progress", "value"), Output("submit-progress", "label")],
+    cancel=[Input("submit-cancel", "n_clicks")],
+    prevent_initial_call=True,
+)
+def submit_scenario(set_progress, n_clicks, category, name, n, p, confidence_level):
+    """
+    Computes a submitted scenario in a background job process and publishes it to the gallery.
+
+    Jobs for the same scenario name are serialized by a lock, so an identical
+    submission waits for the running one and is then served from the manifest.
+    At most MAX_RUNNING_JOBS scenarios are rendered at once, at a lower priority
+    than the web workers. Cancelling kills the job; nothing is published.
+    """
+    scenario = {
+        "n": int(n) if n is not None and n == int(n) else n,
+        "p": p,
+        "confidence_level": confidence_level,
+        "scenario_name": f"{category} {(name or '').strip().lower()}",
+    }
+    error = submission_error(scenario, category)
+    if error:
+        return dbc.Alert(error, color="warning")
+
+    lower_priority()
+    scenario_name = scenario["scenario_name"]
+    route = next(route for route, (_, keyword) in SCENARIO_ROUTES.items() if keyword == category)
+    published = dbc.Alert(["Scenario added to the gallery: ", dcc.Link(scenario_name.title(), href=route)], color="success")
+    digest = scenario_digest(scenario, code_digest())
+
+    set_progress((0, "Queued"))
+    with cache_lock(job_cache, f"scenario-{scenario_name}", on_wait=lambda: set_progress((0, "Waiting for an identical submission"))):
+        entry = load_manifest(MANIFEST_PATH).get(scenario_name)
+        taken = os.path.exists(os.path.join(PLOT_DIR, f"{scenario_name}_normal.jpeg"))
+        if (entry is not None or taken) and (entry or {}).get("params") != scenario:
+            return dbc.Alert(f"A different scenario is already named {scenario_name!r}.", color="danger")
+        if is_up_to_date(entry, digest):
+            return published
+
+        with cache_lock(job_cache, job_slots(), on_wait=lambda: set_progress((0, "Waiting for a free worker"))):
+            # Start from a clean staging directory (a cancelled job may have left one behind)
+            staged_dir = staging_dir(digest)
+            shutil.rmtree(staged_dir, ignore_errors=True)
+            os.makedirs(staged_dir)
+            fields = render_scenario(
+                scenario,
+                staged_dir,
+                staged_results_dir(staged_dir),
+                progress=lambda done, total, message: set_progress((round(95 * done / total), message)),
+            )
+        with cache_lock(job_cache, "manifest"):
+            publish_scenario(scenario, digest, fields, staged_dir, PLOT_DIR, RESULTS_DIR)
+    set_progress((100, "Published"))
+    return published
+
+
+preload()
+
+
+# Run the app (development server; production uses gunicorn, see gunicorn.conf.py)
 if __name__ == "__main__":
+    metrics.reset()
     app.run_server(host="0.0.0.0", port=8050, debug=False)
\ No newline at end of file
@@ -0,0 +1,51 @@
+// Client-side callbacks used when the app runs with CLIENTSIDE_MODAL=1
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    modal: {
+        // Opens the modal for the clicked image without a server round-trip.
+        // Plots redrawn from page data hide the full-size image and do not download it.
+        toggle_modal: function (nClicks, isOpen, pageData) {
+            const triggered = dash_clientside.callback_context.triggered;
+            if (!nClicks.some(Boolean) || !triggered.length) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            const propId = triggered[0].prop_id;
+            const imageFile = JSON.parse(propId.slice(0, propId.lastIndexOf("."))).index;
+            const item = (pageData || {})[imageFile];
+            if (!item) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+            if (item.levels) {
+                return [!isOpen, item.name, null, {display: "none"}, imageFile];
+            }
+            return [!isOpen, item.name, item.path, {}, imageFile];
+        },
+
+        // Redraws the selected plot with the interval bounds of the chosen confidence level
+        draw_figure: function (level, imageFile, pageData) {
+            const item = (pageData || {})[imageFile];
+            if (!item || !item.levels) {
+                return [{}, {display: "none"}];
+            }
+            const shapes = [];
+            item.levels[String(level)].forEach(function (bounds, i) {
+                bounds.forEach(function (x) {
+                    shapes.push({
+                        type: "line", x0: x, x1: x, yref: "paper", y0: 0, y1: 1,
+                        line: {color: item.color, dash: i === 0 ? "dash" : "dot"},
+                    });
+                });
+            });
+            const figure = {
+                data: [{x: item.x, y: item.y, mode: item.mode, name: item.name, line: {color: item.color}}],
+                layout: {
+                    title: {text: item.name + " (CI=" + (level * 100) + "%)"},
+                    xaxis: {title: {text: "Proportion"}, range: item.zoom},
+                    yaxis: {title: {text: "Density"}},
+                    shapes: shapes,
+                    plot_bgcolor: "white",
+                },
+            };
+            return [figure, {display: "block"}];
+        },
+    },
+});
@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.calculations import compute_intervals  # noqa: E402
+from utils.figures import compact_figure  # noqa: E402
+from utils.plotter import generate_dash_plots  # noqa: E402
+from precomputed_data import scenarios, scenario_seed  # noqa: E402
+
+# Timings only compare on the machine that recorded them: one baseline per host, never committed
+BASELINES_DIR = os.path.join(ROOT, "benchmarks", "baselines")
+INTERVAL_SIZES = [10 ** exponent for exponent in range(2, 8)]
+INTERVAL_BATCH = 1000
+
+
+def default_baseline_path():
+    return os.path.join(BASELINES_DIR, f"{platform.node() or 'local'}.json")
+
+
+def measure(func, repeat):
+    """
+    Runs func `repeat` times; returns the fastest time and the peak traced memory of one run.
+
+    The minimum is the run least disturbed by other processes, so it is far
+    less noisy than the mean or median on millisecond timings.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": min(times), "peak_bytes": peak}
+
+
+def calibrate(repeat):
+    """Time of a fixed NumPy and pure Python workload, to scale timings recorded under another CPU speed."""
+    values = np.random.default_rng(0).random(1_000_000)
+
+    def workload():
+        np.sort(values)
+        sum(i * i for i in range(300_000))
+    return measure(workload, repeat)["seconds"]
+
+
+def bench_intervals(repeat):
+    """Every interval method for a batch of scenarios, for n from 10^2 to 10^7."""
+    rng = np.random.default_rng(0)
+    results = {}
+    for n in INTERVAL_SIZES:
+        k = rng.binomial(n, rng.uniform(0.001, 0.1, INTERVAL_BATCH))
+        results[f"intervals/n={n}"] = measure(lambda: compute_intervals(n, k, 0.95), repeat)
+    return results
+
+
+def bench_plots(repeat):
+    """generate_dash_plots for each catalog scenario."""
+    return {
+        f"plots/{scenario['scenario_name']}": measure(
+            lambda: generate_dash_plots(scenario["n"], scenario["p"], scenario["confidence_level"], random_state=scenario_seed(scenario)),
+            repeat,
+        )
+        for scenario in scenarios
+    }
+
+
+def bench_payload(repeat):
+    """Serialization of the three figures of the largest scenario, full and compact."""
+    import plotly.io as pio
+
+    scenario = max(scenarios, key=lambda item: item["n"])
+    figures = generate_dash_plots(scenario["n"], scenario["p"], scenario["confidence_level"], random_state=scenario_seed(scenario))
+    return {
+        f"payload/full/{scenario['scenario_name']}": measure(lambda: [pio.to_json(fig) for fig in figures], repeat),
+        f"payload/compact/{scenario['scenario_name']}": measure(lambda: [json.dumps(compact_figure(fig)) for fig in figures], repeat),
+    }
+
+
+def bench_export(repeat):
+    """JPEG export of the three figures of the largest scenario."""
+    scenario = max(scenarios, key=lambda item: item["n"])
+    figures = generate_dash_plots(scenario["n"], scenario["p"], scenario["confidence_level"], random_state=scenario_seed(scenario))
+    try:
+        import kaleido  # noqa: F401
+    except ImportError:
+        print("kaleido is not installed, skipping the JPEG export benchmark")
+        return {}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        def export():
+            for i, fig in enumerate(figures):
+                compact_figure(fig, binary=False).write_image(os.path.join(tmp_dir, f"{i}.jpeg"), format="jpeg", width=800, height=600)
+        return {f"export/{scenario['scenario_name']}": measure(export, repeat)}
+
+
+def dash_request(client, output, outputs, inputs, state=(), changed=()):
+    """Posts a callback request the way the Dash renderer does."""
+    response = client.post("/_dash-update-component", json={
+        "output": output,
+        "outputs": outputs,
+        "inputs": inputs,
+        "state": list(state),
+        "changedPropIds": list(changed),
+    })
+    if response.status_code not in (200, 204):
+        raise RuntimeError(f"{output} returned HTTP {response.status_code}")
+    return response
+
+
+def bench_pages(repeat):
+    """
+    display_page and toggle_modal requests through the Flask test client, layout caches cleared.
+
+    Must run from the repository root (the app reads assets/plots). The
+    requests are recorded in a throwaway metrics store, not in the one of a
+    server running from the same directory.
+    """
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="bench-metrics-")
+    import app
+
+    client = app.server.test_client()
+    results = {}
+    for pathname in ["/", *app.SCENARIO_ROUTES]:
+        def display():
+            app.cached_page.cache_clear()
+            app.create_gallery_page.cache_clear()
+            dash_request(
+                client,
+                "page-content.children",
+                {"id": "page-content", "property": "children"},
+                [{"id": "url", "property": "pathname", "value": pathname}],
+                changed=["url.pathname"],
+            )
+        results[f"display_page{pathname}"] = measure(display, repeat)
+
+    if not app.CLIENTSIDE_MODAL:
+        files = [entry["file"] for entry in app.scenario_index.entries()][:app.PAGE_SIZE]
+        clicked = {"type": "image", "index": files[0]}
+        results["toggle_modal"] = measure(
+            lambda: dash_request(
+                client,
+                "..modal.is_open...modal-title.children...modal-image.src..",
+                [
+                    {"id": "modal", "property": "is_open"},
+                    {"id": "modal-title", "property": "children"},
+                    {"id": "modal-image", "property": "src"},
+                ],
+                [[
+                    {"id": {"type": "image", "index": file}, "property": "n_clicks", "value": 1 if file == files[0] else None}
+                    for file in files
+                ]],
+                state=[{"id": "modal", "property": "is_open", "value": False}],
+                changed=[json.dumps(clicked, separators=(",", ":"), sort_keys=True) + ".n_clicks"],
+            ),
+            repeat,
+        )
+    return results
+
+
+SUITES = {
+    "intervals": bench_intervals,
+    "plots": bench_plots,
+    "payload": bench_payload,
+    "export": bench_export,
+    "pages": bench_pages,
+}
+
+
+def compare(run, baseline, threshold, min_seconds):
+    """
+    Lists the benchmarks slower or heavier than the baseline by more than threshold (a fraction).
+
+    Baseline times are first scaled by the ratio of the calibration times, so
+    a machine that is uniformly slower (or busier) does not fail every
+    benchmark. Slowdowns under min_seconds are ignored as timer noise.
+    """
+    scale = run["calibration_seconds"] / baseline["calibration_seconds"]
+    regressions = []
+    for name, current in run["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            continue
+        expected = reference["seconds"] * scale
+        if current["seconds"] > expected * (1 + threshold) and current["seconds"] - expected > min_seconds:
+            regressions.append(f"{name}: seconds {current['seconds']:.4g} vs baseline {expected:.4g} (scaled by {scale:.2f})")
+        if reference["peak_bytes"] > 0 and current["peak_bytes"] > reference["peak_bytes"] * (1 + threshold):
+            regressions.append(f"{name}: peak_bytes {current['peak_bytes']:.4g} vs baseline {reference['peak_bytes']:.4g}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile the interval engine, plots and pages.")
+    parser.add_argument("--suite", choices=list(SUITES), action="append", help="suites to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per benchmark (the fastest counts)")
+    parser.add_argument("--output", default="bench_output.json", help="where to write the results")
+    parser.add_argument("--baseline", default=default_baseline_path(), help="baseline results to compare against (default: this host's)")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before failing (0.25 = +25%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.002, help="slowdowns below this many seconds are ignored")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--no-compare", action="store_true", help="only record the results, without a baseline comparison")
+    args = parser.parse_args()
+    # The app and the plots are read relative to the repository root
+    os.chdir(ROOT)
+
+    # Calibrated before and after the suites, so a speed change while they run is caught
+    calibration = calibrate(args.repeat)
+    results = {}
+    for suite in args.suite or SUITES:
+        print(f"Running {suite} benchmarks")
+        results.update(SUITES[suite](args.repeat))
+    calibration = min(calibration, calibrate(args.repeat))
+    run = {"host": platform.node(), "calibration_seconds": calibration, "results": results}
+
+    for name, result in results.items():
+        print(f"{name:45s} {result['seconds'] * 1000:10.2f} ms {result['peak_bytes'] / 2 ** 20:10.2f} MiB")
+    print(f"{'calibration':45s} {run['calibration_seconds'] * 1000:10.2f} ms")
+    with open(args.output, "w") as f:
+        json.dump(run, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    elif not args.no_compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline for this host at {args.baseline}: record one with --save-baseline, or pass --no-compare")
+            sys.exit(2)
+        with open(args.baseline) as f:
+            regressions = compare(run, json.load(f), args.threshold, args.min_seconds)
+        if regressions:
+            print("Regressions beyond the threshold:")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print("No regression against the baseline")
@@ -0,0 +1,35 @@
+# Production server: gunicorn -c gunicorn.conf.py app:server
+import gc
+import multiprocessing
+import os
+from utils.metrics import MetricsRegistry
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "2"))
+
+# Import the app (scenario index, result store memory maps) once in the master;
+# workers are forked from it and share those pages copy-on-write
+preload_app = True
+
+# Recycle workers gracefully after a number of requests, with jitter so they do not restart together
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+graceful_timeout = 30
+timeout = 120
+keepalive = 5
+
+accesslog = "-"
+
+
+def on_starting(server):
+    # Start with empty metrics. A master re-executed for a rolling restart
+    # (master_pid set) keeps the counters of the workers it replaces.
+    if not server.master_pid:
+        MetricsRegistry().reset()
+
+
+def pre_fork(server, worker):
+    # Move the preloaded objects out of the garbage collector's reach so that
+    # collections in the workers do not touch (and copy) the shared pages
+    gc.freeze()
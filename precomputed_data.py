@@ -1,5 +1,15 @@
+import argparse
+import hashlib
+import json
 import os
-from utils.plotter import generate_dash_plots
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import diskcache
+from utils.images import DERIVED_DIR, write_derivatives
+from utils.figures import compact_figure
+from utils.plotter import compute_plot_data, build_figures
+from utils.jobs import JOBS_DIR, cache_lock
+from utils.store import RESULTS_DIR, scenario_path, swap_directory, write_scenario
 
 # Define scenarios
 scenarios = [
@@ -14,15 +24,197 @@ scenarios = [
     {"n": 500_000, "p": 0.01, "confidence_level": 0.95, "scenario_name": "large sample 3"},
 ]
 
-# Create directory for JPEG files
-# os.makedirs("plots", exist_ok=True)
+PLOT_DIR = "assets/plots"
+MANIFEST_PATH = os.path.join(PLOT_DIR, "manifest.json")
+PLOT_METHODS = ("normal", "exact", "bayesian")
 
-# Generate and save plots
-for scenario in scenarios:
+# Any change to these files (computation, figures, thumbnails, result store layout) invalidates every rendered scenario
+CODE_FILES = (
+    os.path.join(os.path.dirname(__file__), "utils", "plotter.py"),
+    os.path.join(os.path.dirname(__file__), "utils", "calculations.py"),
+    os.path.join(os.path.dirname(__file__), "utils", "figures.py"),
+    os.path.join(os.path.dirname(__file__), "utils", "images.py"),
+    os.path.join(os.path.dirname(__file__), "utils", "store.py"),
+)
+
+
+def code_digest():
+    """Hashes the plotting and calculation code."""
+    digest = hashlib.sha256()
+    for path in CODE_FILES:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def scenario_digest(scenario, code_hash):
+    """Hashes a scenario's parameters together with the code that renders it."""
+    payload = json.dumps(scenario, sort_keys=True) + code_hash
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def scenario_seed(scenario):
+    """Derives a reproducible random seed from the scenario parameters."""
+    payload = json.dumps(scenario, sort_keys=True)
+    return int(hashlib.sha256(payload.encode()).hexdigest()[:8], 16)
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Reads the manifest of rendered scenarios (empty if missing)."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """Writes the manifest atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def derivative_files(entry):
+    """Derived file names (relative to the plot dir) listed by a manifest entry."""
+    return {
+        file
+        for derivatives in entry.get("derivatives", {}).values()
+        for files in derivatives.values()
+        for file in files.values()
+    }
+
+
+def is_up_to_date(entry, digest, plot_dir=PLOT_DIR, results_dir=RESULTS_DIR):
+    """Checks that a manifest entry matches the digest and that its files exist."""
+    return (
+        entry is not None
+        and entry.get("hash") == digest
+        and all(os.path.exists(os.path.join(plot_dir, file)) for file in entry["outputs"].values())
+        and "derivatives" in entry
+        and all(os.path.exists(os.path.join(plot_dir, file)) for file in derivative_files(entry))
+        and os.path.isdir(scenario_path(entry["params"]["scenario_name"], results_dir))
+    )
+
+
+def render_scenario(scenario, plot_dir=PLOT_DIR, results_dir=RESULTS_DIR, progress=None):
+    """
+    Generates and saves the three plots, their thumbnails and the results of a scenario.
+
+    progress(done, total, message) is called after each step when given.
+    Returns the manifest fields listing the output and derived file names.
+    """
     n, p, confidence, name = scenario["n"], scenario["p"], scenario["confidence_level"], scenario["scenario_name"]
-    fig_normal, fig_exact, fig_bayesian = generate_dash_plots(n, p, confidence)
+    total = 2 + len(PLOT_METHODS)
+    progress = progress or (lambda done, total, message: None)
+    data = compute_plot_data(n, p, confidence, random_state=scenario_seed(scenario))
+    progress(1, total, "Intervals computed")
+    write_scenario(data, name, results_dir)
+    progress(2, total, "Results stored")
+    figures = build_figures(data)
+
+    # Save each plot as a JPEG file, plus thumbnails in modern formats
+    outputs, derivatives = {}, {}
+    for method, fig in zip(PLOT_METHODS, figures):
+        file = f"{name}_{method}.jpeg"
+        tmp_path = os.path.join(plot_dir, f".{file}.tmp")
+        compact_figure(fig, binary=False).write_image(tmp_path, format="jpeg", width=800, height=600)
+        os.replace(tmp_path, os.path.join(plot_dir, file))
+        outputs[method] = file
+        derivatives[method] = write_derivatives(os.path.join(plot_dir, file))
+        progress(2 + len(outputs), total, f"{method.title()} plot rendered")
+    return {"outputs": outputs, "derivatives": derivatives}
+
+
+def staging_dir(digest, plot_dir=PLOT_DIR):
+    """Hidden directory of plot_dir where a scenario is rendered before being published."""
+    return os.path.join(plot_dir, ".staging", digest)
+
+
+def staged_results_dir(staged_dir):
+    """Result store of a staging directory, swapped into the real store on publication."""
+    return os.path.join(staged_dir, "results")
+
+
+def publish_scenario(scenario, digest, fields, staged_dir, plot_dir=PLOT_DIR, results_dir=RESULTS_DIR):
+    """
+    Moves a scenario rendered into staged_dir to plot_dir and the result store, and records it in the manifest.
+
+    The scenario must have been rendered with its results in
+    staged_results_dir(staged_dir). The results, the thumbnails and the manifest
+    entry are in place before the plots are renamed into plot_dir, so the
+    scenario index never lists a plot without its entry. The manifest is read,
+    updated and rewritten: callers must hold the "manifest" lock. Thumbnails of
+    the previous render that the new entry does not list are deleted once the
+    new entry is saved.
+    """
+    name = scenario["scenario_name"]
+    os.makedirs(results_dir, exist_ok=True)
+    swap_directory(scenario_path(name, staged_results_dir(staged_dir)), scenario_path(name, results_dir))
+    os.makedirs(os.path.join(plot_dir, DERIVED_DIR), exist_ok=True)
+    for file in os.listdir(os.path.join(staged_dir, DERIVED_DIR)):
+        os.replace(os.path.join(staged_dir, DERIVED_DIR, file), os.path.join(plot_dir, DERIVED_DIR, file))
+
+    manifest_path = os.path.join(plot_dir, "manifest.json")
+    manifest = load_manifest(manifest_path)
+    previous = manifest.get(name)
+    manifest[name] = {"hash": digest, "params": scenario, **fields}
+    save_manifest(manifest, manifest_path)
+    if previous is not None:
+        for file in derivative_files(previous) - derivative_files(fields):
+            try:
+                os.remove(os.path.join(plot_dir, file))
+            except FileNotFoundError:
+                pass
+
+    for file in fields["outputs"].values():
+        os.replace(os.path.join(staged_dir, file), os.path.join(plot_dir, file))
+    shutil.rmtree(staged_dir, ignore_errors=True)
+
+
+def run(scenario_list=scenarios, plot_dir=PLOT_DIR, results_dir=RESULTS_DIR, jobs=None, force=False):
+    """
+    Renders every out-of-date scenario across a process pool and updates the manifest.
+
+    The manifest is reloaded and updated under the "manifest" lock of the job
+    cache for every scenario, so entries published by the web app meanwhile
+    are kept.
+    """
+    os.makedirs(plot_dir, exist_ok=True)
+    manifest_path = os.path.join(plot_dir, "manifest.json")
+    manifest = load_manifest(manifest_path)
+    code_hash = code_digest()
+
+    pending = {}
+    for scenario in scenario_list:
+        digest = scenario_digest(scenario, code_hash)
+        if force or not is_up_to_date(manifest.get(scenario["scenario_name"]), digest, plot_dir, results_dir):
+            pending[scenario["scenario_name"]] = (scenario, digest)
+
+    print(f"{len(pending)} of {len(scenario_list)} scenarios to render")
+    if pending:
+        job_cache = diskcache.Cache(JOBS_DIR)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(render_scenario, scenario, plot_dir, results_dir): name
+                for name, (scenario, _) in pending.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                scenario, digest = pending[name]
+                entry = {"hash": digest, "params": scenario, **future.result()}
+                # Save after each scenario so an interrupted run keeps its progress
+                with cache_lock(job_cache, "manifest"):
+                    manifest = load_manifest(manifest_path)
+                    manifest[name] = entry
+                    save_manifest(manifest, manifest_path)
+                print(f"Rendered {name}")
+    return manifest
+
 
-    # Save each plot as a JPEG file
-    fig_normal.write_image(f"assets/plots/{name}_normal.jpeg", format="jpeg", width=800, height=600)
-    fig_exact.write_image(f"assets/plots/{name}_exact.jpeg", format="jpeg", width=800, height=600)
-    fig_bayesian.write_image(f"assets/plots/{name}_bayesian.jpeg", format="jpeg", width=800, height=600)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the scenario plots into assets/plots and their results into the result store.")
+    parser.add_argument("--jobs", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="re-render every scenario")
+    args = parser.parse_args()
+    run(jobs=args.jobs, force=args.force)
@@ -0,0 +1,158 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+from utils.store import write_columns
+from utils.tables import lookup_intervals
+
+# Input layouts: one row per obligor observation, or one pre-aggregated row per portfolio
+EVENT_COLUMNS = ["portfolio_id", "default_flag"]
+AGGREGATED_COLUMNS = ["portfolio_id", "n", "k"]
+# Bytes of CSV parsed per batch
+BLOCK_SIZE = 64 << 20
+INTERVAL_CHUNK = 10_000
+
+
+def input_columns(path):
+    """Detects whether the file holds events or pre-aggregated (n, k) rows."""
+    if path.endswith(".parquet"):
+        names = pq.ParquetFile(path).schema_arrow.names
+    else:
+        with pv.open_csv(path) as reader:
+            names = reader.schema.names
+    if all(column in names for column in AGGREGATED_COLUMNS):
+        return AGGREGATED_COLUMNS
+    if all(column in names for column in EVENT_COLUMNS):
+        return EVENT_COLUMNS
+    raise ValueError(f"{path} needs either the columns {EVENT_COLUMNS} or {AGGREGATED_COLUMNS}")
+
+
+def check_rows(table, path):
+    """Raises a ValueError naming the file and a portfolio when a batch holds flags other than 0/1 or counts outside 0 <= k <= n."""
+    if "default_flag" in table.column_names:
+        flags = table.column("default_flag")
+        invalid = pc.and_(pc.not_equal(flags, 0), pc.not_equal(flags, 1))
+        message = "default_flag must be 0 or 1"
+    else:
+        invalid = pc.or_(pc.less(table.column("k"), 0), pc.greater(table.column("k"), table.column("n")))
+        message = "pre-aggregated rows need 0 <= k <= n"
+    if pc.any(invalid).as_py():
+        portfolio_id = table.filter(invalid).column("portfolio_id")[0].as_py()
+        raise ValueError(f"{path}: {message} (portfolio {portfolio_id})")
+
+
+def aggregate(table):
+    """Group-counts a table of events or partial aggregates into one (portfolio_id, n, k) row per portfolio."""
+    if "default_flag" in table.column_names:
+        table = table.group_by("portfolio_id").aggregate([("default_flag", "count"), ("default_flag", "sum")])
+        table = table.rename_columns(["n" if name.endswith("_count") else "k" if name.endswith("_sum") else name for name in table.column_names])
+    else:
+        table = table.group_by("portfolio_id").aggregate([("n", "sum"), ("k", "sum")])
+        table = table.rename_columns([name.removesuffix("_sum") for name in table.column_names])
+    return table.select(AGGREGATED_COLUMNS)
+
+
+def _aggregate_row_groups(path, row_groups, columns):
+    """Aggregates some row groups of a Parquet file (runs in a worker process)."""
+    parquet_file = pq.ParquetFile(path)
+    partials = []
+    for row_group in row_groups:
+        table = parquet_file.read_row_group(row_group, columns=columns)
+        check_rows(table, path)
+        partials.append(aggregate(table))
+    return aggregate(pa.concat_tables(partials))
+
+
+def read_aggregates(path, jobs=None, block_size=BLOCK_SIZE):
+    """
+    Streams the input in batches and returns per-portfolio (n, k) totals.
+
+    Only one batch (a Parquet row group, or block_size bytes of CSV) plus the
+    running per-portfolio totals is held in memory. Parquet row groups are
+    aggregated in parallel across processes; CSV files are parsed by pyarrow's
+    multi-threaded streaming reader.
+    """
+    columns = input_columns(path)
+    if path.endswith(".parquet"):
+        n_row_groups = pq.ParquetFile(path).num_row_groups
+        workers = min(jobs or os.cpu_count(), n_row_groups) or 1
+        groups = [list(range(i, n_row_groups, workers)) for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(_aggregate_row_groups, [path] * workers, groups, [columns] * workers))
+        return aggregate(pa.concat_tables(partials))
+
+    convert_options = pv.ConvertOptions(include_columns=columns, column_types={"portfolio_id": pa.string()})
+    totals = None
+    with pv.open_csv(path, read_options=pv.ReadOptions(block_size=block_size), convert_options=convert_options) as reader:
+        for batch in reader:
+            table = pa.Table.from_batches([batch])
+            check_rows(table, path)
+            partial = aggregate(table)
+            totals = partial if totals is None else aggregate(pa.concat_tables([totals, partial]))
+    if totals is None:
+        raise ValueError(f"{path} holds no rows")
+    return totals
+
+
+def _score_chunk(n, k, confidence_levels):
+    """Every interval method for a chunk of portfolios at every level (runs in a worker process)."""
+    return lookup_intervals(
+        np.repeat(n, len(confidence_levels)),
+        np.repeat(k, len(confidence_levels)),
+        np.tile(confidence_levels, len(n)),
+    )
+
+
+def score(aggregates, confidence_levels=(0.95,), jobs=None, chunk_size=INTERVAL_CHUNK):
+    """
+    Computes the intervals of every portfolio in chunks across a process pool. Returns columns.
+
+    Portfolio sizes and levels with a precomputed table (utils/tables.py) are looked up.
+    """
+    portfolio_ids = np.asarray(aggregates.column("portfolio_id").to_pylist(), dtype=str)
+    n = aggregates.column("n").to_numpy()
+    k = aggregates.column("k").to_numpy()
+    confidence_levels = np.asarray(confidence_levels, dtype=float)
+
+    starts = range(0, len(n), chunk_size)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        chunks = list(executor.map(
+            _score_chunk,
+            [n[start:start + chunk_size] for start in starts],
+            [k[start:start + chunk_size] for start in starts],
+            [confidence_levels] * len(starts),
+        ))
+    columns = {"portfolio_id": np.repeat(portfolio_ids, len(confidence_levels))}
+    for name in chunks[0]:
+        columns[name] = np.concatenate([chunk[name] for chunk in chunks])
+    # The lookup works in floats; counts go out as integers
+    for name in ("n", "k"):
+        columns[name] = columns[name].astype(np.int64)
+    return columns
+
+
+def write_output(columns, path):
+    """Writes the scores as a Parquet file, or as a directory of .npy columns for any other path."""
+    if path.endswith(".parquet"):
+        pq.write_table(pa.table(columns), path)
+    else:
+        write_columns(path, columns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score portfolios with every interval method from a CSV/Parquet file.")
+    parser.add_argument("input", help="rows of (portfolio_id, default_flag) or (portfolio_id, n, k)")
+    parser.add_argument("output", help="output .parquet file, or a directory of .npy columns")
+    parser.add_argument("--confidence-level", type=float, action="append", help="repeat for several levels (default: 0.95)")
+    parser.add_argument("--jobs", type=int, default=None, help="number of worker processes (default: all cores)")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="bytes of CSV parsed per batch")
+    args = parser.parse_args()
+
+    portfolio_totals = read_aggregates(args.input, args.jobs, args.block_size)
+    print(f"{portfolio_totals.num_rows} portfolios")
+    write_output(score(portfolio_totals, args.confidence_level or [0.95], args.jobs), args.output)
+    print(f"Scores written to {args.output}")
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from scipy.stats import beta
+from utils.calculations import beta_hdr, binom_pmf_window, clopper_pearson_interval, compute_intervals
+
+# Unimodal posteriors, from a few observations to a large portfolio
+UNIMODAL = [(1.5, 9.5), (3.5, 2.5), (12.5, 88.5), (500.5, 9500.5), (3000.5, 997000.5)]
+LEVELS = [0.9, 0.95, 0.99]
+
+
+def brute_force_hdr(a, b, level, points=200_001):
+    """Shortest interval [ppf(w), ppf(w + level)] over a fine grid of lower tail masses w."""
+    w = np.linspace(0, 1 - level, points)
+    lower, upper = beta.ppf(w, a, b), beta.ppf(w + level, a, b)
+    shortest = np.argmin(upper - lower)
+    return lower[shortest], upper[shortest]
+
+
+@pytest.mark.parametrize("a, b", UNIMODAL)
+@pytest.mark.parametrize("level", LEVELS)
+def test_beta_hdr_is_the_shortest_interval(a, b, level):
+    lower, upper = beta_hdr(a, b, level)
+    # Coverage equal to the level and equal densities at both bounds
+    assert beta.cdf(upper, a, b) - beta.cdf(lower, a, b) == pytest.approx(level, abs=1e-10)
+    assert beta.logpdf(lower, a, b) == pytest.approx(beta.logpdf(upper, a, b), abs=1e-6)
+    # No interval of the same mass is shorter; the grid minimum sits on a flat
+    # bottom, so compare widths rather than bound positions
+    brute_lower, brute_upper = brute_force_hdr(a, b, level)
+    assert upper - lower <= (brute_upper - brute_lower) * (1 + 1e-9)
+    assert upper - lower == pytest.approx(brute_upper - brute_lower, rel=1e-6)
+
+
+@pytest.mark.parametrize("a", [2.5, 500.5, 500_000.5])
+def test_beta_hdr_keeps_an_exact_root(a):
+    # Symmetric densities: the equal-tailed warm start already has equal densities
+    lower, upper = beta_hdr(a, a, 0.95, max_iter=1)
+    assert lower == pytest.approx(beta.ppf(0.025, a, a), rel=1e-12)
+    assert upper == pytest.approx(beta.ppf(0.975, a, a), rel=1e-12)
+
+
+def test_beta_hdr_reuses_equal_tailed_bounds():
+    a, b = np.array([2.5, 40.5]), np.array([7.5, 60.5])
+    equal_tailed = (beta.ppf(0.025, a, b), beta.ppf(0.975, a, b))
+    np.testing.assert_allclose(beta_hdr(a, b, 0.95, equal_tailed), beta_hdr(a, b, 0.95), rtol=1e-12)
+
+
+@pytest.mark.parametrize("n", [1, 10, 1000, 10**6])
+@pytest.mark.parametrize("level", LEVELS)
+def test_hdr_closed_forms_at_k_0_and_n(n, level):
+    columns = compute_intervals(n, [0, n], level)
+    # k = 0: decreasing Beta(1/2, n + 1/2) density, HDR anchored at 0
+    assert columns["hdr_lower"][0] == 0.0
+    assert columns["hdr_upper"][0] == pytest.approx(beta.ppf(level, 0.5, n + 0.5), rel=1e-12)
+    # k = n: increasing density, HDR anchored at 1
+    assert columns["hdr_lower"][1] == pytest.approx(beta.ppf(1 - level, n + 0.5, 0.5), rel=1e-12)
+    assert columns["hdr_upper"][1] == 1.0
+
+
+@pytest.mark.parametrize("n", [1, 10, 1000, 10**6])
+@pytest.mark.parametrize("level", LEVELS)
+def test_clopper_pearson_at_k_0_and_n(n, level):
+    tail = (1 - level) / 2
+    p_hat, lower, upper = clopper_pearson_interval(n, [0, n], level)
+    np.testing.assert_array_equal(p_hat, [0.0, 1.0])
+    # Closed forms: (alpha / 2) ** (1 / n) bounds the other end
+    assert lower[0] == 0.0
+    assert upper[0] == pytest.approx(1 - tail ** (1 / n), rel=1e-10)
+    assert lower[1] == pytest.approx(tail ** (1 / n), rel=1e-10)
+    assert upper[1] == 1.0
+
+
+def test_compute_intervals_broadcasts_scalars_and_arrays():
+    n, k = 200, np.array([0, 7, 100, 200])
+    levels = np.array([[0.9], [0.95], [0.99]])
+    columns = compute_intervals(n, k, levels)
+    for name, values in columns.items():
+        assert values.shape == (3, 4), name
+    for i, level in enumerate(levels.ravel()):
+        for j, successes in enumerate(k):
+            scalar = compute_intervals(n, successes, level)
+            for name, values in scalar.items():
+                assert values.shape == ()
+                assert columns[name][i, j] == pytest.approx(values, rel=1e-12, abs=1e-15), name
+
+
+def test_beta_hdr_broadcasts_scalars_and_arrays():
+    lower, upper = beta_hdr(np.array([[2.5], [30.5]]), np.array([5.5, 50.5, 500.5]), 0.95)
+    assert lower.shape == upper.shape == (2, 3)
+    scalar_lower, scalar_upper = beta_hdr(30.5, 50.5, 0.95)
+    assert scalar_lower.shape == ()
+    assert lower[1, 1] == pytest.approx(scalar_lower, rel=1e-12)
+    assert upper[1, 1] == pytest.approx(scalar_upper, rel=1e-12)
+
+
+@pytest.mark.parametrize("n, k, level", [(0, 0, 0.95), (10, 11, 0.95), (10, -1, 0.95), (10, 3, 1.0)])
+def test_compute_intervals_rejects_invalid_inputs(n, k, level):
+    with pytest.raises(ValueError):
+        compute_intervals(n, k, level)
+
+
+@pytest.mark.parametrize("n, p", [(50, 0.3), (10**6, 0.5), (10**8, 0.01), (10**12, 0.3)])
+def test_binom_pmf_window_mass_matches_truncation_error(n, p):
+    k, pmf, truncation_error = binom_pmf_window(n, p)
+    assert truncation_error <= 1e-12
+    assert 1 - pmf.sum() == pytest.approx(truncation_error, abs=1e-13)
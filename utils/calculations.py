@@ -1,143 +1,219 @@
-from dash import Dash, html, dcc, Input, Output, State
-import dash_bootstrap_components as dbc
-import os
-
-# Initialize the app
-app = Dash(
-    __name__,
-    external_stylesheets=[dbc.themes.BOOTSTRAP],
-)
-app.title = "Confidence Interval Comparison"
-
-# Helper function to create a card for each scenario
-def create_scenario_card(scenario_name, image_path):
-    """Create a card for a scenario with its image."""
-    return dbc.Card(
-        dbc.CardBody([
-            html.H5(scenario_name, className="card-title text-center"),
-            html.Img(
-                src=image_path,
-                className="img-fluid scenario-image",
-                style={"cursor": "pointer"},
-                id=f"image-{scenario_name.replace(' ', '-')}",
-            ),
-        ]),
-        className="mb-4",
-    )
+import numpy as np
+from scipy.stats import norm, beta, binom
 
-# Layout for each section (Baseline, Low Default, Large Sample)
-def create_scenario_section(title, scenario_cards):
-    return html.Div([
-        html.H2(title, className="text-center my-4 text-primary"),
-        dbc.Row(
-            [dbc.Col(card, width=4) for card in scenario_cards],
-            className="g-4",
-        ),
-    ], className="mt-4")
-
-# Main Layout
-def create_layout():
-    # Read image files
-    image_dir = "assets/plots"
-    baseline_cards = []
-    low_default_cards = []
-    large_sample_cards = []
-
-    for image_file in os.listdir(image_dir):
-        if image_file.endswith(".jpeg"):
-            scenario_name = image_file.replace("_", " ").replace(".jpeg", "").title()
-            image_path = f"/{image_dir}/{image_file}"
-
-            if "Baseline" in scenario_name:
-                baseline_cards.append(create_scenario_card(scenario_name, image_path))
-            elif "Low Default" in scenario_name:
-                low_default_cards.append(create_scenario_card(scenario_name, image_path))
-            elif "Large Sample" in scenario_name:
-                large_sample_cards.append(create_scenario_card(scenario_name, image_path))
-
-    return dbc.Container(
-        [
-            # Navbar
-            dbc.NavbarSimple(
-                brand="Confidence Interval Comparison",
-                brand_href="/",
-                color="primary",
-                dark=True,
-            ),
-            dcc.Location(id="url", refresh=False),
-            html.Div(id="page-content"),
-        ],
-        fluid=True,
-    )
+# Jeffreys prior Beta(1/2, 1/2)
+JEFFREYS_PRIOR = (0.5, 0.5)
 
-# Welcome Page Layout
-def welcome_page():
-    return dbc.Container(
-        [
-            html.H1("Welcome to the Confidence Interval Comparison Tool", className="text-center my-4"),
-            html.P("Navigate through different scenarios to visualize confidence intervals.", className="text-center"),
-            dbc.Button("Explore Scenarios", href="/scenarios", color="primary", size="lg", className="d-block mx-auto"),
-        ],
-        fluid=True,
-        className="mt-5",
+
+def _as_batch(n, k, confidence_level):
+    """Broadcasts (n, k, confidence_level) to float arrays and validates them."""
+    n, k, confidence_level = np.broadcast_arrays(
+        np.asarray(n, dtype=float),
+        np.asarray(k, dtype=float),
+        np.asarray(confidence_level, dtype=float),
     )
+    if np.any(n <= 0):
+        raise ValueError("n must be positive")
+    if np.any((k < 0) | (k > n)):
+        raise ValueError("k must lie between 0 and n")
+    if np.any((confidence_level <= 0) | (confidence_level >= 1)):
+        raise ValueError("confidence_level must lie strictly between 0 and 1")
+    return n, k, confidence_level
+
+
+def simulate_defaults(n, probability, random_state=None):
+    """Draws the number of successes k ~ Binomial(n, p) for each scenario."""
+    rng = np.random.default_rng(random_state)
+    return rng.binomial(np.asarray(n, dtype=np.int64), probability)
+
+
+def binom_pmf_window(n, probability, tolerance=1e-12, max_points=None):
+    """
+    Evaluates the Binomial(n, p) pmf on the quantile window only.
+
+    The window [k_lower, k_upper] holds all but `tolerance` of the mass, so its
+    length grows like sqrt(n p (1 - p)) instead of n. When max_points is given,
+    longer windows are sampled at max_points evenly spaced k. binom.pmf does not
+    underflow for very large n and, unlike exp(logpmf), keeps its precision
+    there, so the window mass matches 1 - truncation_error.
+
+    Returns (k, pmf, truncation_error) where truncation_error is the exact mass
+    left outside the window.
+    """
+    k_lower = binom.ppf(tolerance / 2, n, probability)
+    k_upper = binom.isf(tolerance / 2, n, probability)
+    if max_points is not None and k_upper - k_lower + 1 > max_points:
+        k = np.unique(np.round(np.linspace(k_lower, k_upper, max_points)))
+    else:
+        k = np.arange(k_lower, k_upper + 1)
+    pmf = binom.pmf(k, n, probability)
+    truncation_error = binom.cdf(k_lower - 1, n, probability) + binom.sf(k_upper, n, probability)
+    return k, pmf, float(truncation_error)
+
+
+# Vectorized interval functions: every argument may be a scalar or an array,
+# all of them are broadcast together and the bounds come back as arrays.
+def wald_interval(n, k, confidence_level=0.95):
+    """Normal approximation (Wald) interval. Returns (p_hat, lower, upper)."""
+    n, k, confidence_level = _as_batch(n, k, confidence_level)
+    p_hat = k / n
+    z = norm.ppf(0.5 + confidence_level / 2)
+    half_width = z * np.sqrt(p_hat * (1 - p_hat) / n)
+    return p_hat, np.clip(p_hat - half_width, 0, 1), np.clip(p_hat + half_width, 0, 1)
+
+
+def clopper_pearson_interval(n, k, confidence_level=0.95):
+    """Exact Clopper-Pearson interval. Returns (p_hat, lower, upper)."""
+    n, k, confidence_level = _as_batch(n, k, confidence_level)
+    tail = (1 - confidence_level) / 2
+    with np.errstate(invalid="ignore"):
+        lower = beta.ppf(tail, k, n - k + 1)
+        upper = beta.ppf(1 - tail, k + 1, n - k)
+    lower = np.where(k == 0, 0.0, lower)
+    upper = np.where(k == n, 1.0, upper)
+    return k / n, lower, upper
+
+
+def beta_posterior_interval(n, k, confidence_level=0.95, prior=JEFFREYS_PRIOR):
+    """
+    Equal-tailed credible interval under a Beta(alpha_0, beta_0) prior.
+
+    prior is an (alpha_0, beta_0) pair of scalars or arrays broadcasting with
+    n, k and confidence_level. Returns (alpha_post, beta_post, lower, upper).
+    """
+    prior_alpha, prior_beta = (np.asarray(value, dtype=float) for value in prior)
+    if np.any(prior_alpha <= 0) or np.any(prior_beta <= 0):
+        raise ValueError("The prior parameters must be positive")
+    n, k, confidence_level = _as_batch(n, k, confidence_level)
+    alpha_post = k + prior_alpha
+    beta_post = n - k + prior_beta
+    tail = (1 - confidence_level) / 2
+    lower = beta.ppf(tail, alpha_post, beta_post)
+    upper = beta.ppf(1 - tail, alpha_post, beta_post)
+    return alpha_post, beta_post, lower, upper
 
-# Scenarios Page Layout
-def scenarios_page():
-    image_dir = "assets/plots"
-    baseline_cards = []
-    low_default_cards = []
-    large_sample_cards = []
-
-    for image_file in os.listdir(image_dir):
-        if image_file.endswith(".jpeg"):
-            scenario_name = image_file.replace("_", " ").replace(".jpeg", "").title()
-            image_path = f"/{image_dir}/{image_file}"
-
-            if "Baseline" in scenario_name:
-                baseline_cards.append(create_scenario_card(scenario_name, image_path))
-            elif "Low Default" in scenario_name:
-                low_default_cards.append(create_scenario_card(scenario_name, image_path))
-            elif "Large Sample" in scenario_name:
-                large_sample_cards.append(create_scenario_card(scenario_name, image_path))
-
-    return dbc.Container(
-        [
-            create_scenario_section("Baseline Scenarios", baseline_cards),
-            create_scenario_section("Low Default Portfolio Scenarios", low_default_cards),
-            create_scenario_section("Large Sample Scenarios", large_sample_cards),
-            # Modal for larger image
-            dbc.Modal(
-                [
-                    dbc.ModalHeader(dbc.ModalTitle(id="modal-title")),
-                    dbc.ModalBody(html.Img(id="modal-image", className="img-fluid")),
-                ],
-                id="image-modal",
-                size="lg",
-            ),
-        ],
-        fluid=True,
+
+def jeffreys_interval(n, k, confidence_level=0.95):
+    """Equal-tailed Jeffreys credible interval. Returns (alpha_post, beta_post, lower, upper)."""
+    return beta_posterior_interval(n, k, confidence_level, JEFFREYS_PRIOR)
+
+
+def beta_hdr(alpha_post, beta_post, confidence_level=0.95, equal_tailed=None, tol=1e-12, max_iter=50):
+    """
+    Highest-density region of Beta(alpha_post, beta_post), vectorized over arrays.
+
+    Monotone densities (mode at 0 or 1, e.g. k=0 under the Jeffreys prior) have a
+    closed form HDR anchored at the boundary. For unimodal densities the lower
+    tail mass w is found by safeguarded Newton iterations on
+    log f(ppf(w + level)) = log f(ppf(w)), warm-started from the equal-tailed
+    interval (w = (1 - level) / 2); pass its bounds as `equal_tailed` to reuse them.
+    U-shaped and uniform densities have no single-interval HDR and keep the
+    equal-tailed bounds.
+    """
+    alpha_post, beta_post, confidence_level = np.broadcast_arrays(
+        np.asarray(alpha_post, dtype=float),
+        np.asarray(beta_post, dtype=float),
+        np.asarray(confidence_level, dtype=float),
     )
+    shape = alpha_post.shape
+    a, b, level = alpha_post.ravel(), beta_post.ravel(), confidence_level.ravel()
+    tail = (1 - level) / 2
+    if equal_tailed is None:
+        lower = beta.ppf(tail, a, b)
+        upper = beta.ppf(1 - tail, a, b)
+    else:
+        lower, upper = (np.array(np.broadcast_to(bound, shape), dtype=float).ravel() for bound in equal_tailed)
+
+    # Closed forms for monotone densities
+    decreasing = (a <= 1) & (b > 1)
+    lower[decreasing] = 0.0
+    upper[decreasing] = beta.ppf(level[decreasing], a[decreasing], b[decreasing])
+    increasing = (a > 1) & (b <= 1)
+    lower[increasing] = beta.ppf(1 - level[increasing], a[increasing], b[increasing])
+    upper[increasing] = 1.0
+
+    # Safeguarded Newton on the lower tail mass for unimodal densities
+    active = np.flatnonzero((a > 1) & (b > 1))
+    w = tail[active]
+    w_lo, w_hi = np.zeros_like(w), 1 - level[active]
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        aa, bb, lv = a[active], b[active], level[active]
+        l, u = lower[active], upper[active]
+        log_f_l, log_f_u = beta.logpdf(l, aa, bb), beta.logpdf(u, aa, bb)
+        g = log_f_u - log_f_l
+        # g decreases with w: a positive value means the interval must move right
+        w_lo = np.where(g > 0, w, w_lo)
+        w_hi = np.where(g > 0, w_hi, w)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            dg = ((aa - 1) / u - (bb - 1) / (1 - u)) * np.exp(-log_f_u) - ((aa - 1) / l - (bb - 1) / (1 - l)) * np.exp(-log_f_l)
+            w_new = w - g / dg
+        outside = ~((w_new > w_lo) & (w_new < w_hi))
+        w_new = np.where(outside, (w_lo + w_hi) / 2, w_new)
+        # Equal log densities: w is the root (bisecting would move away from it)
+        w_new = np.where(g == 0, w, w_new)
+        lower[active] = beta.ppf(w_new, aa, bb)
+        upper[active] = beta.ppf(w_new + lv, aa, bb)
+        pending = np.abs(w_new - w) > tol
+        active, w, w_lo, w_hi = active[pending], w_new[pending], w_lo[pending], w_hi[pending]
+    return lower.reshape(shape), upper.reshape(shape)
+
+
+def compute_intervals(n, k, confidence_level=0.95):
+    """
+    Computes every interval method for a batch of scenarios in one call.
 
-# App Layout
-app.layout = create_layout()
-
-# Callback for page navigation
-@app.callback(
-    Output("page-content", "children"),
-    Input("url", "pathname"),
-)
-def display_page(pathname):
-    if pathname == "/scenarios":
-        return scenarios_page()
-    return welcome_page()
-
-# Callback for opening the modal
-@app.callback(
-    [Output("modal-title", "children"), Output("modal-image", "src"), Output("image-modal", "is_open")],
-    [Input({"type": "image", "index": ALL}, "n_clicks")],
-    [State({"type": "image", "index": ALL}, "id")],
-    prevent_initial_call=True,
-)
-def open_image_modal(n_clicks, ids):
-    ctx = dash.callback
+    Returns a dict of equally shaped arrays (one column per quantity).
+    """
+    n, k, confidence_level = _as_batch(n, k, confidence_level)
+    p_hat, wald_lower, wald_upper = wald_interval(n, k, confidence_level)
+    _, cp_lower, cp_upper = clopper_pearson_interval(n, k, confidence_level)
+    alpha_post, beta_post, jeffreys_lower, jeffreys_upper = jeffreys_interval(n, k, confidence_level)
+    hdr_lower, hdr_upper = beta_hdr(alpha_post, beta_post, confidence_level, (jeffreys_lower, jeffreys_upper))
+    return {
+        "n": n,
+        "k": k,
+        "confidence_level": confidence_level,
+        "p_hat": p_hat,
+        "wald_lower": wald_lower,
+        "wald_upper": wald_upper,
+        "cp_lower": cp_lower,
+        "cp_upper": cp_upper,
+        "jeffreys_lower": jeffreys_lower,
+        "jeffreys_upper": jeffreys_upper,
+        "hdr_lower": hdr_lower,
+        "hdr_upper": hdr_upper,
+    }
+
+
+# Scalar helpers used by the plotting code. When k is not given, the number of
+# successes is simulated from the input probability.
+def standardize_binomial_distribution(n, probability, confidence_level=0.95, k=None, random_state=None):
+    """Returns (p_hat, (lower, upper)) for the normal approximation."""
+    if k is None:
+        k = simulate_defaults(n, probability, random_state)
+    p_hat, lower, upper = wald_interval(n, k, confidence_level)
+    return float(p_hat), (float(lower), float(upper))
+
+
+def exact_binom_distribution(n, probability, confidence_level=0.95, k=None, random_state=None):
+    """Returns (p_hat, (lower, upper)) for the Clopper-Pearson interval."""
+    if k is None:
+        k = simulate_defaults(n, probability, random_state)
+    p_hat, lower, upper = clopper_pearson_interval(n, k, confidence_level)
+    return float(p_hat), (float(lower), float(upper))
+
+
+def jeffreys_prior_posterior(n, probability, confidence_level=0.95, k=None, random_state=None):
+    """Returns (alpha_post, beta_post, (lower, upper), (hdr_lower, hdr_upper)) under the Jeffreys prior."""
+    if k is None:
+        k = simulate_defaults(n, probability, random_state)
+    alpha_post, beta_post, lower, upper = jeffreys_interval(n, k, confidence_level)
+    hdr_lower, hdr_upper = beta_hdr(alpha_post, beta_post, confidence_level, (lower, upper))
+    return (
+        float(alpha_post),
+        float(beta_post),
+        (float(lower), float(upper)),
+        (float(hdr_lower), float(hdr_upper)),
+    )
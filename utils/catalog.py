@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+
+
+def _stat_signature(path):
+    """Modification time of a path, or None when it does not exist."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class ScenarioIndex:
+    """
+    In-memory index of the rendered plots, grouped by category keyword.
+
+    The directory is scanned once; afterwards refresh() only stats the plot
+    directory and the manifest and rebuilds the index when either changed.
+    `version` increases on every rebuild so callers can key caches on it.
+    """
+
+    def __init__(self, image_dir="assets/plots", categories=(), manifest_name="manifest.json", extension=".jpeg"):
+        self.image_dir = image_dir
+        self.categories = tuple(categories)
+        self.manifest_path = os.path.join(image_dir, manifest_name)
+        self.extension = extension
+        self.version = 0
+        self._signature = None
+        self._entries = []
+        self._groups = {}
+        self._by_file = {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _current_signature(self):
+        return _stat_signature(self.image_dir), _stat_signature(self.manifest_path)
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _scan(self):
+        manifest = self._load_manifest()
+        entries = []
+        for image_file in sorted(os.listdir(self.image_dir)):
+            if not image_file.endswith(self.extension) or image_file.startswith("."):
+                continue
+            stem = image_file[:-len(self.extension)]
+            scenario, _, method = stem.rpartition("_")
+            entries.append({
+                "file": image_file,
+                "name": stem.replace("_", " ").title(),
+                "scenario": scenario,
+                "method": method,
+                "path": f"/{self.image_dir}/{image_file}",
+                "params": manifest.get(scenario, {}).get("params", {}),
+                "derivatives": manifest.get(scenario, {}).get("derivatives", {}).get(method, {}),
+            })
+        return entries
+
+    def refresh(self):
+        """Rebuilds the index if the directory or the manifest changed. Returns True on rebuild."""
+        signature = self._current_signature()
+        if signature == self._signature:
+            return False
+        with self._lock:
+            if signature == self._signature:
+                return False
+            self._entries = self._scan() if signature[0] is not None else []
+            self._groups = {
+                keyword: [entry for entry in self._entries if keyword in entry["file"].lower()]
+                for keyword in self.categories
+            }
+            self._by_file = {entry["file"]: entry for entry in self._entries}
+            self._signature = signature
+            self.version += 1
+        return True
+
+    def entries(self, keyword=None):
+        """Indexed plots, optionally restricted to the ones whose file name contains keyword."""
+        if keyword is None:
+            return list(self._entries)
+        if keyword in self._groups:
+            return list(self._groups[keyword])
+        return [entry for entry in self._entries if keyword in entry["file"].lower()]
+
+    def query(self, keyword=None, method=None, n_range=(None, None), sort_by="name", descending=False, p_range=(None, None)):
+        """
+        Filters and sorts the indexed plots.
+
+        method keeps a single plot type ("normal", "exact", "bayesian"), n_range
+        and p_range bound the scenario size and probability (None for no bound)
+        and sort_by is "name", "n" or "p". Plots whose parameters are unknown
+        (no manifest entry) are kept by open bounds only and sort last.
+        """
+        entries = self._groups.get(keyword) if keyword in self._groups else self.entries(keyword)
+        if method:
+            entries = [entry for entry in entries if entry["method"] == method]
+        for field, (minimum, maximum) in (("n", n_range), ("p", p_range)):
+            if minimum is not None:
+                entries = [entry for entry in entries if entry["params"].get(field, float("-inf")) >= minimum]
+            if maximum is not None:
+                entries = [entry for entry in entries if entry["params"].get(field, float("inf")) <= maximum]
+        if sort_by == "name":
+            return sorted(entries, key=lambda entry: entry["file"], reverse=descending)
+        known = [entry for entry in entries if sort_by in entry["params"]]
+        unknown = [entry for entry in entries if sort_by not in entry["params"]]
+        known.sort(key=lambda entry: (entry["params"][sort_by], entry["file"]), reverse=descending)
+        return known + unknown
+
+    def find(self, image_file):
+        """Looks up the entry of an image file name."""
+        return self._by_file.get(image_file)
@@ -0,0 +1,86 @@
+import base64
+import numpy as np
+import plotly.graph_objects as go
+
+# Upper bound on the points kept per trace, whatever the size of the scenario
+MAX_TRACE_POINTS = 1000
+# Points kept on each side of the peak and of every interval bound
+ANCHOR_RADIUS = 5
+# Precision of the arrays sent to the browser or to kaleido
+PAYLOAD_DTYPE = np.float32
+TYPED_ARRAY_CODES = {np.dtype(np.float32): "f4", np.dtype(np.float64): "f8"}
+
+
+def decimate(x, y, max_points=MAX_TRACE_POINTS, anchors=(), radius=ANCHOR_RADIUS):
+    """
+    Shape-preserving downsampling of a curve to about max_points points.
+
+    The curve is cut into buckets holding equal shares of its total variation
+    (half) and of its points (half), so steep regions such as a narrow peak get
+    most of the buckets. The first point, minimum and maximum of each bucket are
+    kept (min-max decimation), as well as the last point, the global peak and
+    the `radius` points around every anchor (interval bounds). Returns sorted
+    indices into x and y.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    size = len(y)
+    if size <= max_points:
+        return np.arange(size)
+    finite = np.isfinite(y)
+    if not finite.all():
+        # Plotly leaves gaps at NaN points; decimate the finite part only
+        kept = np.flatnonzero(finite)
+        return kept[decimate(x[kept], y[kept], max_points, anchors, radius)]
+
+    # Neighborhoods of the peak and of the anchors
+    centers = np.concatenate([[np.argmax(y)], np.searchsorted(x, anchors)]).astype(np.int64)
+    neighborhoods = (centers[:, None] + np.arange(-radius, radius + 1)).ravel()
+
+    # Bucket edges at equal quantiles of the cumulative variation and point count
+    n_buckets = max(1, (max_points - len(neighborhoods) - 1) // 3)
+    variation = np.cumsum(np.abs(np.diff(y, prepend=y[0])))
+    weight = np.arange(1, size + 1) / size
+    if variation[-1] > 0:
+        weight = (weight + variation / variation[-1]) / 2
+    edges = np.unique(np.searchsorted(weight, np.arange(n_buckets) / n_buckets))
+    edges = edges[edges < size]
+    bucket = np.repeat(np.arange(len(edges)), np.diff(np.append(edges, size)))
+
+    keep = [edges, [size - 1], neighborhoods]
+    for extreme in (np.minimum, np.maximum):
+        candidates = np.flatnonzero(y == extreme.reduceat(y, edges)[bucket])
+        keep.append(candidates[np.unique(bucket[candidates], return_index=True)[1]])
+    indices = np.concatenate(keep)
+    return np.unique(indices[(indices >= 0) & (indices < size)])
+
+
+def typed_array(values, dtype=PAYLOAD_DTYPE):
+    """Encodes an array in the plotly.js typed array format {dtype, bdata} (base64 of the raw bytes)."""
+    values = np.ascontiguousarray(values, dtype=dtype)
+    return {"dtype": TYPED_ARRAY_CODES[values.dtype], "bdata": base64.b64encode(values.tobytes()).decode("ascii")}
+
+
+def figure_anchors(layout):
+    """x positions of the vertical lines (interval bounds) of a figure layout dict."""
+    return sorted(shape["x0"] for shape in layout.get("shapes", ()) if shape.get("type") == "line" and shape["x0"] == shape["x1"])
+
+
+def compact_figure(fig, max_points=MAX_TRACE_POINTS, binary=True):
+    """
+    Decimated, float32 version of a figure ready to be sent.
+
+    With binary=True, returns a JSON-ready dict whose trace arrays are typed
+    arrays, for dcc.Graph (plotly.js >= 2.28 decodes them in the browser). With
+    binary=False, returns a go.Figure holding float32 values, for write_image.
+    Either way the payload size depends on max_points, not on n.
+    """
+    # Work on the plain dict: copying a go.Figure re-validates every array
+    payload = fig.to_plotly_json()
+    anchors = figure_anchors(payload["layout"])
+    for trace in payload["data"]:
+        x, y = np.asarray(trace["x"], dtype=float), np.asarray(trace["y"], dtype=float)
+        indices = decimate(x, y, max_points, anchors)
+        x, y = x[indices].astype(PAYLOAD_DTYPE), y[indices].astype(PAYLOAD_DTYPE)
+        trace["x"], trace["y"] = (typed_array(x), typed_array(y)) if binary else (x, y)
+    return payload if binary else go.Figure(payload)
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import re
+from urllib.parse import quote
+from PIL import Image
+
+# Derived images live next to the plots and are served with immutable cache headers
+DERIVED_DIR = "derived"
+THUMBNAIL_WIDTHS = (320, 640)
+THUMBNAIL_FORMATS = ("avif", "webp", "jpeg")
+SAVE_OPTIONS = {
+    "avif": {"quality": 60},
+    "webp": {"quality": 75, "method": 6},
+    "jpeg": {"quality": 80, "optimize": True, "progressive": True},
+}
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+
+
+def supported_formats(formats=THUMBNAIL_FORMATS):
+    """Formats Pillow can write here (AVIF needs Pillow >= 11.2 or the pillow-avif plugin)."""
+    extensions = Image.registered_extensions()
+    return [fmt for fmt in formats if extensions.get(f".{fmt}") in Image.SAVE]
+
+
+def content_hash(path, length=12):
+    """Short hash of a file's bytes, used to version derived file names."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:length]
+
+
+def write_derivatives(image_path, widths=THUMBNAIL_WIDTHS, formats=THUMBNAIL_FORMATS):
+    """
+    Writes resized, content-hashed copies of an image in every supported format.
+
+    Files go to <image dir>/derived/<stem>.<hash>.<width>.<format>; stale copies of
+    the same image are removed. Returns {format: {width: file name relative to
+    the image dir}}.
+    """
+    image_dir, image_file = os.path.split(image_path)
+    stem = os.path.splitext(image_file)[0]
+    derived_dir = os.path.join(image_dir, DERIVED_DIR)
+    os.makedirs(derived_dir, exist_ok=True)
+    digest = content_hash(image_path)
+
+    derivatives = {}
+    written = set()
+    with Image.open(image_path) as image:
+        image = image.convert("RGB")
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            for fmt in supported_formats(formats):
+                file = f"{stem}.{digest}.{width}.{fmt}"
+                path = os.path.join(derived_dir, file)
+                if not os.path.exists(path):
+                    tmp_path = os.path.join(derived_dir, f".{file}.tmp")
+                    resized.save(tmp_path, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+                    os.replace(tmp_path, path)
+                derivatives.setdefault(fmt, {})[width] = f"{DERIVED_DIR}/{file}"
+                written.add(file)
+
+    # Drop derivatives of previous versions of this image
+    pattern = re.compile(rf"{re.escape(stem)}\.[0-9a-f]+\.\d+\.\w+")
+    for file in os.listdir(derived_dir):
+        if file not in written and pattern.fullmatch(file):
+            os.remove(os.path.join(derived_dir, file))
+    return derivatives
+
+
+def srcset(derivatives, fmt, prefix):
+    """Builds an HTML srcset attribute for one format of write_derivatives() output."""
+    # URLs are percent-encoded because srcset entries are separated by whitespace
+    return ", ".join(f"{quote(f'{prefix}/{file}')} {width}w" for width, file in sorted(derivatives[fmt].items(), key=lambda item: int(item[0])))
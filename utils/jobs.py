@@ -0,0 +1,77 @@
+import contextlib
+import os
+import time
+import psutil
+
+# On-disk queue and result cache of the background jobs (diskcache), shared by every worker process
+JOBS_DIR = os.environ.get("JOBS_DIR", "jobs")
+# Seconds a finished job's result is kept for its browser to fetch
+JOB_RESULT_EXPIRE = 3600
+# Number of scenario jobs computed at the same time; further jobs wait in the queue
+MAX_RUNNING_JOBS = int(os.environ.get("MAX_RUNNING_JOBS", "2"))
+# Nice increment of job processes, so that page requests keep the CPU first
+JOB_NICENESS = 10
+LOCK_POLL_INTERVAL = 0.5
+
+
+def _process_alive(pid):
+    """Whether a process is running (a killed job not reaped yet is a zombie)."""
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def _try_acquire(cache, key, pid):
+    """Takes a lock key, reclaiming it when the process holding it is gone (a cancelled job)."""
+    if cache.add(key, pid):
+        return True
+    owner = cache.get(key)
+    if owner is not None and not _process_alive(owner):
+        with cache.transact():
+            if cache.get(key) == owner:
+                cache.delete(key)
+        return cache.add(key, pid)
+    return False
+
+
+@contextlib.contextmanager
+def cache_lock(cache, keys, poll_interval=LOCK_POLL_INTERVAL, on_wait=None):
+    """
+    Inter-process lock on any one of `keys`, stored in a diskcache.Cache.
+
+    A key is held by the id of the acquiring process, so locks left behind by a
+    killed process are taken over instead of blocking forever. Passing several
+    keys makes a counting semaphore. on_wait() is called once when the lock is
+    not immediately available. Yields the key held.
+    """
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    pid = os.getpid()
+    waited = False
+    while True:
+        held = next((key for key in keys if _try_acquire(cache, key, pid)), None)
+        if held is not None:
+            break
+        if not waited and on_wait is not None:
+            on_wait()
+        waited = True
+        time.sleep(poll_interval)
+    try:
+        yield held
+    finally:
+        with cache.transact():
+            if cache.get(held) == pid:
+                cache.delete(held)
+
+
+def job_slots(count=MAX_RUNNING_JOBS):
+    """Lock keys of the job slots, for cache_lock()."""
+    return [f"job-slot-{i}" for i in range(count)]
+
+
+def lower_priority(increment=JOB_NICENESS):
+    """Lowers the scheduling priority of the current (job) process."""
+    try:
+        psutil.Process().nice(psutil.Process().nice() + increment)
+    except (psutil.AccessDenied, ValueError):
+        pass
@@ -0,0 +1,231 @@
+import bisect
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import diskcache
+from flask import Response, g, request
+
+logger = logging.getLogger(__name__)
+
+# Samples shared by the worker processes
+METRICS_DIR = os.environ.get("METRICS_DIR", "metrics")
+
+# Histogram buckets: latency in seconds, payload size in bytes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000)
+
+# Opt-in sampling profiler: requests slower than this many milliseconds log their hottest stacks
+PROFILE_SLOW_MS = float(os.environ.get("METRICS_PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL = 0.005
+
+
+def render_histogram(name, labels, buckets, counts, total):
+    """Formats one labelled histogram (per-bucket counts, not cumulative) in the Prometheus layout."""
+    lines = []
+    cumulative = 0
+    for bound, count in zip((*buckets, "+Inf"), counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f"{name}_sum{{{labels}}} {total}")
+    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+    return lines
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread at a fixed interval from a background thread."""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = traceback.extract_stack(frame)
+                self.samples["\n".join(f"{entry.filename}:{entry.lineno} {entry.name}" for entry in stack[-8:])] += 1
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self, top=5):
+        total = sum(self.samples.values()) or 1
+        return "\n\n".join(
+            f"{count / total:.0%} of {total} samples:\n{stack}" for stack, count in self.samples.most_common(top)
+        )
+
+
+class MetricsRegistry:
+    """
+    Callback latency, payload size and cache statistics of every worker process.
+
+    Samples are added to a diskcache.Cache shared by the gunicorn workers
+    (atomic increments in one transaction per request), so a scrape of any
+    worker reports the totals of all of them.
+    """
+
+    def __init__(self, metrics_dir=METRICS_DIR):
+        self.store = diskcache.Cache(metrics_dir)
+        self.caches = {}
+        # Last cache_info() of each registered cache in this process, to turn it into monotonic counters
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Drops every sample (called once per server start, see gunicorn.conf.py)."""
+        self.store.clear()
+
+    def register_cache(self, name, cached_function):
+        """Exposes the statistics of a functools.lru_cache wrapped function."""
+        self.caches[name] = cached_function
+        self._seen[name] = (0, 0)
+
+    def clear_cache(self, name):
+        """Clears a registered cache without losing the hits and misses counted so far."""
+        with self._lock:
+            self._collect_caches([name])
+            self.caches[name].cache_clear()
+            self._seen[name] = (0, 0)
+
+    def _collect_caches(self, names):
+        """Adds the hits and misses of this process since the last collection to the shared counters."""
+        for name in names:
+            info = self.caches[name].cache_info()
+            hits, misses = self._seen[name]
+            if info.hits > hits:
+                self.store.incr(("cache_hits", name), info.hits - hits, default=0)
+            if info.misses > misses:
+                self.store.incr(("cache_misses", name), info.misses - misses, default=0)
+            self._seen[name] = (info.hits, info.misses)
+
+    def observe(self, callback, seconds, size, status):
+        with self._lock, self.store.transact():
+            self.store.incr(("latency", callback, bisect.bisect_left(LATENCY_BUCKETS, seconds)), 1, default=0)
+            self.store.incr(("latency_sum", callback), seconds, default=0)
+            self.store.incr(("payload", callback, bisect.bisect_left(SIZE_BUCKETS, size)), 1, default=0)
+            self.store.incr(("payload_sum", callback), size, default=0)
+            if status >= 400:
+                self.store.incr(("errors", callback), 1, default=0)
+            self._collect_caches(self.caches)
+
+    def _histograms(self, samples, metric, buckets):
+        """Per-callback bucket counts and sums of a histogram metric."""
+        histograms = {}
+        for key, value in samples.items():
+            if key[0] == metric:
+                histograms.setdefault(key[1], [[0] * (len(buckets) + 1), 0])[0][key[2]] = value
+        for callback, histogram in histograms.items():
+            histogram[1] = samples.get((f"{metric}_sum", callback), 0)
+        return sorted(histograms.items())
+
+    def render(self):
+        """Formats every metric in the Prometheus text exposition format, one group per metric family."""
+        with self._lock:
+            self._collect_caches(self.caches)
+        samples = {key: self.store.get(key, 0) for key in self.store}
+
+        lines = [
+            "# HELP dash_callback_latency_seconds Server time spent in a Dash callback request.",
+            "# TYPE dash_callback_latency_seconds histogram",
+        ]
+        for callback, (counts, total) in self._histograms(samples, "latency", LATENCY_BUCKETS):
+            lines.extend(render_histogram("dash_callback_latency_seconds", f'callback="{callback}"', LATENCY_BUCKETS, counts, total))
+        lines += [
+            "# HELP dash_callback_response_bytes Size of a Dash callback response.",
+            "# TYPE dash_callback_response_bytes histogram",
+        ]
+        for callback, (counts, total) in self._histograms(samples, "payload", SIZE_BUCKETS):
+            lines.extend(render_histogram("dash_callback_response_bytes", f'callback="{callback}"', SIZE_BUCKETS, counts, total))
+        lines += [
+            "# HELP dash_callback_errors_total Dash callback requests answered with an error status.",
+            "# TYPE dash_callback_errors_total counter",
+        ]
+        lines.extend(
+            f'dash_callback_errors_total{{callback="{key[1]}"}} {value}'
+            for key, value in sorted(samples.items()) if key[0] == "errors"
+        )
+
+        hits = {name: samples.get(("cache_hits", name), 0) for name in sorted(self.caches)}
+        misses = {name: samples.get(("cache_misses", name), 0) for name in sorted(self.caches)}
+        lines += [
+            "# HELP cache_hits_total Hits of an in-process cache, summed over the workers.",
+            "# TYPE cache_hits_total counter",
+        ]
+        lines.extend(f'cache_hits_total{{cache="{name}"}} {count}' for name, count in hits.items())
+        lines += [
+            "# HELP cache_misses_total Misses of an in-process cache, summed over the workers.",
+            "# TYPE cache_misses_total counter",
+        ]
+        lines.extend(f'cache_misses_total{{cache="{name}"}} {count}' for name, count in misses.items())
+        lines += [
+            "# HELP cache_hit_ratio Share of cache lookups that were hits.",
+            "# TYPE cache_hit_ratio gauge",
+        ]
+        lines.extend(
+            f'cache_hit_ratio{{cache="{name}"}} {hits[name] / (hits[name] + misses[name]) if hits[name] + misses[name] else 0.0}'
+            for name in hits
+        )
+        return "\n".join(lines) + "\n"
+
+
+def callback_name(app, output):
+    """Name of the Python function answering a Dash callback output."""
+    callback = app.callback_map.get(output, {}).get("callback")
+    return getattr(callback, "__name__", output)
+
+
+def init_metrics(app, registry=None, route="/metrics"):
+    """
+    Instruments the Dash callback requests of app and serves the metrics on route.
+
+    Latency and payload size are recorded per callback from the Flask request
+    hooks, so the callbacks themselves are left untouched. Samples accumulate
+    in the shared store: importing the app (a worker, a script or the
+    benchmarks) never clears the counters of a running server. The server
+    resets them when it starts, in gunicorn.conf.py.
+    """
+    registry = registry or MetricsRegistry()
+    server = app.server
+
+    @server.before_request
+    def start_timer():
+        if request.path.endswith("/_dash-update-component"):
+            g.metrics_start = time.perf_counter()
+            if PROFILE_SLOW_MS > 0:
+                g.metrics_profiler = SamplingProfiler(threading.get_ident()).start()
+
+    @server.after_request
+    def record_metrics(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        body = request.get_json(silent=True) or {}
+        callback = callback_name(app, body.get("output", ""))
+        size = response.calculate_content_length() or 0
+        registry.observe(callback, seconds, size, response.status_code)
+
+        profiler = g.pop("metrics_profiler", None)
+        if profiler is not None:
+            profiler.stop()
+            if seconds * 1000 > PROFILE_SLOW_MS:
+                logger.warning("Slow callback %s took %.0f ms\n%s", callback, seconds * 1000, profiler.summary())
+        return response
+
+    @server.route(route)
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+    return registry
@@ -1,26 +1,115 @@
 import plotly.graph_objects as go
 import numpy as np
-from scipy.stats import norm, binom, beta
+from scipy.stats import norm, beta
 from utils.calculations import (
+    binom_pmf_window,
+    simulate_defaults,
     standardize_binomial_distribution,
     exact_binom_distribution,
     jeffreys_prior_posterior,
 )
-def generate_dash_plots(n, probability, confidence_level=0.95):
-    # Calculate distributions and intervals
-    p_hat_normal, ci_normal = standardize_binomial_distribution(n, probability, confidence_level)
-    p_hat_exact, ci_exact = exact_binom_distribution(n, probability, confidence_level)
-    alpha_post, beta_post, ci_bayesian, hdr_bayesian = jeffreys_prior_posterior(n, probability, confidence_level)
 
-    x_normal = np.linspace(0, 1, n * 10)
-    x_beta = np.linspace(0, 1, n * 10)
+# Default number of points placed inside the visible window in "adaptive" grid mode
+GRID_POINTS = 2000
+# Most k at which the exact pmf is evaluated, whatever the size of its window
+EXACT_MAX_POINTS = 20_000
+
+
+def adaptive_grid(lower, upper, anchors, num_points=GRID_POINTS):
+    """
+    Builds a grid of at most num_points points on [lower, upper].
+
+    Half of the points are spread uniformly over the window, the other half are
+    clustered around the anchors (interval bounds, mode) so that the curve stays
+    smooth where it matters. The size does not depend on n.
+    """
+    anchors = [a for a in anchors if lower <= a <= upper]
+    n_uniform = num_points if not anchors else num_points // 2
+    grid = [np.linspace(lower, upper, n_uniform)]
+    if anchors:
+        spread = (upper - lower) / 20
+        offsets = spread * norm.ppf(np.linspace(0.001, 0.999, (num_points - n_uniform) // len(anchors)))
+        grid.extend(np.clip(anchor + offsets, lower, upper) for anchor in anchors)
+    return np.unique(np.concatenate(grid))
+
+
+def compute_plot_data(n, probability, confidence_level=0.95, random_state=None, grid="adaptive", grid_points=GRID_POINTS, k=None):
+    """
+    Computes the intervals and density curves of a scenario.
+
+    When k is given it is used as the observed number of successes instead of a
+    simulated draw. Returns a dict holding the scalar results and, under
+    "curves", the (x, y) arrays of the normal, exact and bayesian plots.
+    """
+    # Simulate the observed number of successes once so that the three methods share the same data
+    if k is None:
+        k = simulate_defaults(n, probability, random_state)
+
+    # Calculate distributions and intervals
+    p_hat_normal, ci_normal = standardize_binomial_distribution(n, probability, confidence_level, k=k)
+    p_hat_exact, ci_exact = exact_binom_distribution(n, probability, confidence_level, k=k)
+    alpha_post, beta_post, ci_bayesian, hdr_bayesian = jeffreys_prior_posterior(n, probability, confidence_level, k=k)
 
     # Zoom range for plots
     zoom_lower = max(0, probability - 3 / np.sqrt(n))
     zoom_upper = min(1, probability + 3 / np.sqrt(n))
 
+    if grid == "adaptive":
+        # Fixed number of points inside the visible window, denser near the bounds and the mode
+        beta_mode = np.clip((alpha_post - 1) / (alpha_post + beta_post - 2), 0, 1) if alpha_post + beta_post > 2 else 0.5
+        x_normal = adaptive_grid(zoom_lower, zoom_upper, [p_hat_normal, *ci_normal], grid_points)
+        x_beta = adaptive_grid(zoom_lower, zoom_upper, [beta_mode, *ci_bayesian, *hdr_bayesian], grid_points)
+    elif grid == "full":
+        x_normal = np.linspace(0, 1, n * 10)
+        x_beta = np.linspace(0, 1, n * 10)
+    else:
+        raise ValueError(f"Unknown grid mode: {grid!r}")
+
+    if 0 < p_hat_normal < 1:
+        normal_density = norm.pdf(x_normal, loc=p_hat_normal, scale=np.sqrt(p_hat_normal * (1 - p_hat_normal) / n))
+    else:
+        # p_hat = 0 or 1: the normal approximation is a point mass, there is no curve to draw
+        x_normal, normal_density = np.empty(0), np.empty(0)
+
+    # Exact binomial distribution (only the window carrying non-negligible mass)
+    k_exact, exact_pmf, truncation_error = binom_pmf_window(n, p_hat_exact, max_points=EXACT_MAX_POINTS)
+    exact_density = exact_pmf * n
+
+    bayesian_density = beta.pdf(x_beta, alpha_post, beta_post)
+
+    return {
+        "n": int(n),
+        "probability": float(probability),
+        "confidence_level": float(confidence_level),
+        "k": int(k),
+        "p_hat": float(p_hat_exact),
+        "ci_normal": ci_normal,
+        "ci_exact": ci_exact,
+        "ci_bayesian": ci_bayesian,
+        "hdr_bayesian": hdr_bayesian,
+        "alpha_post": alpha_post,
+        "beta_post": beta_post,
+        "zoom": (float(zoom_lower), float(zoom_upper)),
+        "truncation_error": truncation_error,
+        "curves": {
+            "normal": (x_normal, normal_density),
+            "exact": (k_exact / n, exact_density),
+            "bayesian": (x_beta, bayesian_density),
+        },
+    }
+
+
+def build_figures(data):
+    """Builds the normal, exact and bayesian figures from compute_plot_data() output."""
+    n, probability, confidence_level = data["n"], data["probability"], data["confidence_level"]
+    ci_normal, ci_exact = data["ci_normal"], data["ci_exact"]
+    ci_bayesian, hdr_bayesian = data["ci_bayesian"], data["hdr_bayesian"]
+    zoom_lower, zoom_upper = data["zoom"]
+    x_normal, normal_density = data["curves"]["normal"]
+    x_exact, exact_density = data["curves"]["exact"]
+    x_beta, bayesian_density = data["curves"]["bayesian"]
+
     # Plot 1: Normal Approximation
-    normal_density = norm.pdf(x_normal, loc=p_hat_normal, scale=np.sqrt(p_hat_normal * (1 - p_hat_normal) / n))
     fig_normal = go.Figure()
     fig_normal.add_trace(go.Scatter(
         x=x_normal,
@@ -31,6 +120,11 @@ def generate_dash_plots(n, probability, confidence_level=0.95):
     ))
     fig_normal.add_vline(x=ci_normal[0], line=dict(color="blue", dash="dash"), annotation_text="CI Lower", annotation_position="top left")
     fig_normal.add_vline(x=ci_normal[1], line=dict(color="blue", dash="dash"), annotation_text="CI Upper", annotation_position="top right")
+    if not len(x_normal):
+        fig_normal.add_annotation(
+            text=f"The normal approximation degenerates to a point mass at p̂ = {data['p_hat']:g}:<br>the Wald interval has zero width.",
+            xref="paper", yref="paper", x=0.5, y=0.5, showarrow=False,
+        )
     fig_normal.update_layout(
         title=f"Normal Approximation (n={n}, p={probability}, CI={confidence_level * 100:.1f}%)",
         xaxis_title="Proportion",
@@ -40,10 +134,9 @@ def generate_dash_plots(n, probability, confidence_level=0.95):
     )
 
     # Plot 2: Exact Binomial Distribution
-    exact_density = binom.pmf(np.arange(n + 1), n, p_hat_exact) * n
     fig_exact = go.Figure()
     fig_exact.add_trace(go.Scatter(
-        x=np.arange(n + 1) / n,
+        x=x_exact,
         y=exact_density,
         mode="markers+lines",
         name="Exact Binomial",
@@ -58,10 +151,10 @@ def generate_dash_plots(n, probability, confidence_level=0.95):
         yaxis_title="Density",
         xaxis=dict(range=[zoom_lower, zoom_upper]),
         template="plotly_white",
+        meta={"truncation_error": data["truncation_error"]},
     )
 
     # Plot 3: Bayesian Posterior
-    bayesian_density = beta.pdf(x_beta, alpha_post, beta_post)
     fig_bayesian = go.Figure()
     fig_bayesian.add_trace(go.Scatter(
         x=x_beta,
@@ -83,78 +176,7 @@ def generate_dash_plots(n, probability, confidence_level=0.95):
     )
 
     return fig_normal, fig_exact, fig_bayesian
-    fig = go.Figure()
-
-    # Normal approximation
-    normal_density = norm.pdf(x_normal, loc=p_hat_normal, scale=np.sqrt(p_hat_normal * (1 - p_hat_normal) / n))
-    fig.add_trace(go.Scatter(
-        x=x_normal,
-        y=normal_density,
-        mode="lines",
-        name="Normal Approximation",
-        line=dict(color="blue", width=2),
-    ))
-    fig.add_trace(go.Scatter(
-        x=[ci_normal[0], ci_normal[1]],
-        y=[0, 0],
-        mode="markers+text",
-        text=["Lower CI", "Upper CI"],
-        name="Normal CI",
-        marker=dict(color="blue", size=10),
-    ))
-
-    # Exact binomial distribution
-    exact_density = binom.pmf(np.arange(n + 1), n, p_hat_exact) * n
-    fig.add_trace(go.Scatter(
-        x=np.arange(n + 1) / n,
-        y=exact_density,
-        mode="markers",
-        name="Exact Binomial",
-        marker=dict(color="green", size=8),
-    ))
-    fig.add_trace(go.Scatter(
-        x=[ci_exact[0], ci_exact[1]],
-        y=[0, 0],
-        mode="markers+text",
-        text=["Lower CI", "Upper CI"],
-        name="Exact CI",
-        marker=dict(color="green", size=10),
-    ))
 
-    # Bayesian posterior
-    bayesian_density = beta.pdf(x_beta, alpha_post, beta_post)
-    fig.add_trace(go.Scatter(
-        x=x_beta,
-        y=bayesian_density,
-        mode="lines",
-        name="Bayesian Posterior",
-        line=dict(color="red", width=2),
-    ))
-    fig.add_trace(go.Scatter(
-        x=[ci_bayesian[0], ci_bayesian[1]],
-        y=[0, 0],
-        mode="markers+text",
-        text=["Lower CI", "Upper CI"],
-        name="Bayesian CI",
-        marker=dict(color="red", size=10),
-    ))
-    fig.add_trace(go.Scatter(
-        x=[hdr_bayesian[0], hdr_bayesian[1]],
-        y=[0, 0],
-        mode="markers+text",
-        text=["HDR Lower", "HDR Upper"],
-        name="Bayesian HDR",
-        marker=dict(color="red", symbol="star", size=12),
-    ))
-
-    # Mise en page
-    fig.update_layout(
-        title=f"Probability Distributions (n={n}, p={probability}, CI={confidence_level * 100:.1f}%)",
-        xaxis_title="Proportion",
-        yaxis_title="Density",
-        legend_title="Distributions",
-        xaxis=dict(range=[zoom_lower, zoom_upper]),
-        template="plotly_white",
-    )
 
-    return fig
\ No newline at end of file
+def generate_dash_plots(n, probability, confidence_level=0.95, random_state=None, grid="adaptive", grid_points=GRID_POINTS):
+    return build_figures(compute_plot_data(n, probability, confidence_level, random_state, grid, grid_points))
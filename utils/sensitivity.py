@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import shutil
+import numpy as np
+from numpy.lib.format import open_memmap
+from utils.calculations import beta_hdr, beta_posterior_interval
+from utils.store import RESULTS_DIR, read_columns, swap_directory, write_columns
+
+# Prior-sensitivity sweeps live next to the scenarios of the result store:
+#   sweeps/<name>/meta.json          grid shape and axis names
+#   sweeps/<name>/axes/<column>.npy  prior_alpha, prior_beta (per prior), n, k (per portfolio), confidence_level
+#   sweeps/<name>/cells/<column>.npy one flat row per (prior, portfolio, level) cell, in C order
+SWEEPS_DIR = os.path.join(RESULTS_DIR, "sweeps")
+SWEEP_COLUMNS = ("alpha_post", "beta_post", "lower", "upper", "hdr_lower", "hdr_upper")
+# Cells computed at once; bounds the memory of a sweep whatever its size
+SWEEP_CHUNK = 100_000
+
+
+def prior_grid(prior_alphas, prior_betas):
+    """Every (alpha_0, beta_0) combination of two axes, as two flat arrays."""
+    prior_alpha, prior_beta = np.meshgrid(np.asarray(prior_alphas, dtype=float), np.asarray(prior_betas, dtype=float), indexing="ij")
+    return prior_alpha.ravel(), prior_beta.ravel()
+
+
+def posterior_bounds(n, k, confidence_level, prior_alpha, prior_beta):
+    """Equal-tailed and HDR bounds of the Beta posterior, broadcast over all arguments. Returns columns."""
+    alpha_post, beta_post, lower, upper = beta_posterior_interval(n, k, confidence_level, (prior_alpha, prior_beta))
+    hdr_lower, hdr_upper = beta_hdr(alpha_post, beta_post, confidence_level, (lower, upper))
+    return {
+        "alpha_post": alpha_post,
+        "beta_post": beta_post,
+        "lower": lower,
+        "upper": upper,
+        "hdr_lower": hdr_lower,
+        "hdr_upper": hdr_upper,
+    }
+
+
+def _axes(prior_alpha, prior_beta, n, k, confidence_levels):
+    """Validated 1-D axes of a sweep grid."""
+    axes = {
+        "prior_alpha": np.atleast_1d(np.asarray(prior_alpha, dtype=float)),
+        "prior_beta": np.atleast_1d(np.asarray(prior_beta, dtype=float)),
+        "n": np.atleast_1d(np.asarray(n, dtype=np.int64)),
+        "k": np.atleast_1d(np.asarray(k, dtype=np.int64)),
+        "confidence_level": np.atleast_1d(np.asarray(confidence_levels, dtype=float)),
+    }
+    if len(axes["prior_alpha"]) != len(axes["prior_beta"]):
+        raise ValueError("prior_alpha and prior_beta must have the same length (see prior_grid)")
+    if len(axes["n"]) != len(axes["k"]):
+        raise ValueError("n and k must have the same length")
+    return axes
+
+
+def prior_sensitivity(prior_alpha, prior_beta, n, k, confidence_levels=(0.95,)):
+    """
+    Posterior bounds of every (prior, portfolio, level) cell in one broadcast computation.
+
+    Priors are given as paired (alpha_0, beta_0) arrays and portfolios as paired
+    (n, k) arrays. Returns columns of shape (priors, portfolios, levels); use
+    write_sweep() for grids that do not fit in memory.
+    """
+    axes = _axes(prior_alpha, prior_beta, n, k, confidence_levels)
+    return posterior_bounds(
+        axes["n"][None, :, None],
+        axes["k"][None, :, None],
+        axes["confidence_level"][None, None, :],
+        axes["prior_alpha"][:, None, None],
+        axes["prior_beta"][:, None, None],
+    )
+
+
+def iter_sweep(axes, chunk_size=SWEEP_CHUNK):
+    """Yields (start, columns) for consecutive chunks of the flattened (prior, portfolio, level) grid."""
+    shape = (len(axes["prior_alpha"]), len(axes["n"]), len(axes["confidence_level"]))
+    size = int(np.prod(shape))
+    for start in range(0, size, chunk_size):
+        prior, portfolio, level = np.unravel_index(np.arange(start, min(start + chunk_size, size)), shape)
+        yield start, posterior_bounds(
+            axes["n"][portfolio],
+            axes["k"][portfolio],
+            axes["confidence_level"][level],
+            axes["prior_alpha"][prior],
+            axes["prior_beta"][prior],
+        )
+
+
+def sweep_path(name, sweeps_dir=SWEEPS_DIR):
+    return os.path.join(sweeps_dir, name)
+
+
+def write_sweep(name, prior_alpha, prior_beta, n, k, confidence_levels=(0.95,), sweeps_dir=SWEEPS_DIR, chunk_size=SWEEP_CHUNK):
+    """
+    Computes a prior-sensitivity sweep chunk by chunk into memory-mapped columns of the store.
+
+    Only one chunk of cells is held in memory, so the grid size is limited by
+    disk space only. The sweep directory is swapped in when complete.
+    """
+    axes = _axes(prior_alpha, prior_beta, n, k, confidence_levels)
+    shape = (len(axes["prior_alpha"]), len(axes["n"]), len(axes["confidence_level"]))
+    size = int(np.prod(shape))
+
+    path = sweep_path(name, sweeps_dir)
+    tmp_path = sweep_path(f".{name}.tmp", sweeps_dir)
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    write_columns(os.path.join(tmp_path, "axes"), axes)
+    os.makedirs(os.path.join(tmp_path, "cells"))
+    cells = {
+        column: open_memmap(os.path.join(tmp_path, "cells", f"{column}.npy"), mode="w+", dtype=np.float64, shape=(size,))
+        for column in SWEEP_COLUMNS
+    }
+    for start, columns in iter_sweep(axes, chunk_size):
+        for column, values in columns.items():
+            cells[column][start:start + len(values)] = values
+    for values in cells.values():
+        values.flush()
+    del cells
+
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump({"shape": shape, "dimensions": ["prior", "portfolio", "confidence_level"]}, f, indent=2)
+    swap_directory(tmp_path, path)
+    return path
+
+
+def read_sweep(name, sweeps_dir=SWEEPS_DIR):
+    """Memory-maps a sweep. Returns (axes, columns of shape (priors, portfolios, levels))."""
+    path = sweep_path(name, sweeps_dir)
+    with open(os.path.join(path, "meta.json")) as f:
+        shape = tuple(json.load(f)["shape"])
+    cells = read_columns(os.path.join(path, "cells"))
+    return read_columns(os.path.join(path, "axes")), {column: values.reshape(shape) for column, values in cells.items()}
+
+
+def parse_portfolio(value):
+    """Parses an "n:k" command line argument."""
+    n, k = value.split(":")
+    return int(n), int(k)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep the Bayesian bounds over a grid of Beta priors, portfolios and levels.")
+    parser.add_argument("name", help="name of the sweep in the result store")
+    parser.add_argument("--prior-alpha", type=float, nargs="+", default=[0.5], help="alpha_0 axis of the prior grid")
+    parser.add_argument("--prior-beta", type=float, nargs="+", default=[0.5], help="beta_0 axis of the prior grid")
+    parser.add_argument("--portfolio", type=parse_portfolio, action="append", required=True, help="n:k, repeatable")
+    parser.add_argument("--level", type=float, action="append", help="confidence level, repeatable (default: 0.95)")
+    parser.add_argument("--sweeps-dir", default=SWEEPS_DIR)
+    parser.add_argument("--chunk-size", type=int, default=SWEEP_CHUNK, help="cells computed at once")
+    args = parser.parse_args()
+
+    portfolio_n, portfolio_k = zip(*args.portfolio)
+    grid_alpha, grid_beta = prior_grid(args.prior_alpha, args.prior_beta)
+    print(f"Sweeping {len(grid_alpha) * len(portfolio_n) * len(args.level or [0.95])} cells")
+    output = write_sweep(args.name, grid_alpha, grid_beta, portfolio_n, portfolio_k, args.level or [0.95], args.sweeps_dir, args.chunk_size)
+    print(f"Sweep written to {output}")
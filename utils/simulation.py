@@ -0,0 +1,175 @@
+import numpy as np
+from scipy.stats import binom
+from utils.calculations import (
+    beta_hdr,
+    clopper_pearson_interval,
+    compute_intervals,
+    jeffreys_interval,
+    wald_interval,
+)
+
+# Interval methods and the compute_intervals columns holding their bounds
+METHODS = {
+    "wald": ("wald_lower", "wald_upper"),
+    "clopper_pearson": ("cp_lower", "cp_upper"),
+    "jeffreys": ("jeffreys_lower", "jeffreys_upper"),
+    "hdr": ("hdr_lower", "hdr_upper"),
+}
+# Binomial mass left outside the k-window of each p
+WINDOW_TOLERANCE = 1e-12
+# Outcomes evaluated per p; longer windows are sampled at a regular stride
+WINDOW_POINTS = 32
+
+
+def _method_bounds(method, n, k, confidence_level):
+    """(lower, upper) of a single method, without computing the others."""
+    if method == "wald":
+        return wald_interval(n, k, confidence_level)[1:]
+    if method == "clopper_pearson":
+        return clopper_pearson_interval(n, k, confidence_level)[1:]
+    alpha_post, beta_post, lower, upper = jeffreys_interval(n, k, confidence_level)
+    if method == "jeffreys":
+        return lower, upper
+    return beta_hdr(alpha_post, beta_post, confidence_level, (lower, upper))
+
+
+def _crossed(n, confidence_level, methods, is_upper, p, k):
+    """Whether upper(k) >= p (is_upper) or lower(k) > p, for many (method, k, p) at once."""
+    crossed = np.empty(len(k), dtype=bool)
+    for method in set(methods):
+        rows = methods == method
+        lower, upper = _method_bounds(method, n, k[rows], confidence_level)
+        crossed[rows] = np.where(is_upper[rows], upper >= p[rows], lower > p[rows])
+    return crossed
+
+
+def _find_crossing(n, confidence_level, methods, is_upper, p, lo, hi, guess):
+    """
+    Smallest k in [lo, hi] where a bound crosses p, for many searches at once.
+
+    The crossing holds at hi and the bounds are monotone in k. The outcomes
+    guess - 1 and guess (an interpolated crossing) are tried first, which
+    settles almost every search; the rest are bisected.
+    """
+    guess = np.clip(guess, lo, hi)
+    crossed = _crossed(n, confidence_level, np.tile(methods, 2), np.tile(is_upper, 2), np.tile(p, 2), np.concatenate([guess - 1, guess]))
+    before, at = np.split(crossed, 2)
+    hi = np.where(before, np.maximum(guess - 1, lo), np.where(at, guess, hi))
+    lo = np.where(before, lo, np.where(at, guess, guess + 1))
+    while np.any(lo < hi):
+        mid = (lo + hi) // 2
+        crossed = _crossed(n, confidence_level, methods, is_upper, p, mid)
+        hi = np.where(crossed, mid, hi)
+        lo = np.where(crossed, lo, mid + 1)
+    return hi
+
+
+def _window_coverage(n, p_values, confidence_level, tolerance, max_points, chunk_size):
+    """
+    Coverage and expected width of every method for one n, over the k-window of each p.
+
+    The bounds are monotone in k, so the outcomes covering p form a range
+    [first k with upper >= p, last k with lower <= p] and the coverage is a
+    difference of binomial cdfs. When the windows hold more than max_points
+    outcomes per p, each is sampled every `step` outcomes: the expected width
+    becomes a quadrature over the samples (the pmf is smooth at that stride)
+    and the range ends falling between two samples are searched for.
+    """
+    rows = np.arange(len(p_values))
+    p = p_values[:, None]
+    k_lower = np.maximum(binom.ppf(tolerance / 2, n, p_values), 0)
+    k_upper = binom.isf(tolerance / 2, n, p_values)
+    length = k_upper - k_lower + 1
+    if min(n + 1, length.sum()) <= max_points * len(p_values) and length.max() * len(p_values) <= chunk_size:
+        step = np.ones(len(p_values))
+    else:
+        step = np.ceil(length / max_points)
+    k = np.minimum(k_lower[:, None] + np.arange(np.max(np.ceil(length / step))) * step[:, None], k_upper[:, None])
+    # Shorter windows repeat their last k; the repeats get no weight
+    weights = np.where(np.diff(k, axis=1, prepend=-1) == 0, 0.0, binom.pmf(k, n, p) * step[:, None])
+
+    # Intervals of each distinct k, computed once for every p sharing it
+    k_values, index = np.unique(k, return_inverse=True)
+    table = {name: values[index.reshape(k.shape)] for name, values in compute_intervals(n, k_values, confidence_level).items()}
+
+    # First sample where each bound crosses p (k_upper + 1 when none does)
+    ends, searches = {}, []
+    for method, (lower_col, upper_col) in METHODS.items():
+        for is_upper, bound in ((True, table[upper_col]), (False, table[lower_col])):
+            crossed = bound >= p if is_upper else bound > p
+            position = np.argmax(crossed, axis=1)
+            found = crossed[rows, position]
+            end = np.where(found, k[rows, position], k_upper + 1)
+            before = np.maximum(position - 1, 0)
+            previous = k[rows, before]
+            between = np.flatnonzero(found & (end - previous > 1))
+            ends[method, is_upper] = end
+            # Linear interpolation of the bound between the two samples
+            b0, b1 = bound[between, before[between]], bound[between, position[between]]
+            guess = previous[between] + np.ceil((p_values[between] - b0) / (b1 - b0) * (end[between] - previous[between]))
+            searches.append((method, is_upper, between, previous[between] + 1, guess))
+
+    # Crossings between two samples are searched, all together
+    between = np.concatenate([search[2] for search in searches])
+    if between.size:
+        crossing = _find_crossing(
+            n,
+            confidence_level,
+            np.concatenate([np.full(len(search_rows), method) for method, _, search_rows, _, _ in searches]),
+            np.concatenate([np.full(len(search_rows), is_upper) for _, is_upper, search_rows, _, _ in searches]),
+            p_values[between],
+            np.concatenate([search[3] for search in searches]),
+            np.concatenate([ends[method, is_upper][search_rows] for method, is_upper, search_rows, _, _ in searches]),
+            np.concatenate([search[4] for search in searches]),
+        )
+        start = 0
+        for method, is_upper, search_rows, _, _ in searches:
+            ends[method, is_upper][search_rows] = crossing[start:start + len(search_rows)]
+            start += len(search_rows)
+
+    results = {}
+    for method, (lower_col, upper_col) in METHODS.items():
+        # Covered outcomes: ends[method, True] <= k < ends[method, False]
+        covered_below = binom.cdf(ends[method, False] - 1, n, p_values)
+        coverage = np.maximum(covered_below - binom.cdf(ends[method, True] - 1, n, p_values), 0.0)
+        width = np.sum(weights * (table[upper_col] - table[lower_col]), axis=1) / np.sum(weights, axis=1)
+        results[method] = (coverage, width)
+    return results, step == 1
+
+
+def coverage_grid(n_values, p_values, confidence_level=0.95, tolerance=WINDOW_TOLERANCE, max_points=WINDOW_POINTS,
+                  chunk_size=2_000_000):
+    """
+    Coverage probability and expected width of every interval method over an (n, p) grid.
+
+    Sums run over the k-window holding all but `tolerance` of the
+    Binomial(n, p) mass, about sqrt(n p (1 - p)) outcomes, so any n is
+    tractable. The coverage is exact to within `tolerance`. The expected width
+    is summed over every outcome when the windows of an n hold at most
+    max_points outcomes per p, and by quadrature over every step-th outcome
+    otherwise. The intervals of each n are computed once for all p values
+    sharing an outcome, and chunk_size bounds the number of (p, k) cells held in
+    memory at a time.
+
+    Returns a dict of arrays of shape (len(n_values), len(p_values)) named
+    "<method>_coverage" and "<method>_width", plus the grid itself and an
+    "exact" flag per cell telling whether the width was summed over every k.
+    """
+    n_values = np.atleast_1d(np.asarray(n_values, dtype=np.int64))
+    p_values = np.atleast_1d(np.asarray(p_values, dtype=float))
+
+    grid = {"n": n_values, "p": p_values, "exact": np.empty((len(n_values), len(p_values)), dtype=bool)}
+    for method in METHODS:
+        grid[f"{method}_coverage"] = np.empty((len(n_values), len(p_values)))
+        grid[f"{method}_width"] = np.empty((len(n_values), len(p_values)))
+
+    rows = max(1, chunk_size // max_points)
+    for i, n in enumerate(n_values):
+        for start in range(0, len(p_values), rows):
+            chunk = slice(start, start + rows)
+            results, exact = _window_coverage(int(n), p_values[chunk], confidence_level, tolerance, max_points, chunk_size)
+            grid["exact"][i, chunk] = exact
+            for method, (coverage, width) in results.items():
+                grid[f"{method}_coverage"][i, chunk] = coverage
+                grid[f"{method}_width"][i, chunk] = width
+    return grid
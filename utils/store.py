@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import numpy as np
+
+# Columnar result store: one directory per scenario holding
+#   meta.json              scalar parameters and results
+#   intervals/<column>.npy one row per interval method
+#   curves/<plot>_x.npy    float32 density curves
+# Every array is a plain .npy file, so readers memory-map it instead of loading it.
+RESULTS_DIR = "results"
+INTERVAL_METHODS = ("normal", "exact", "bayesian", "bayesian_hdr")
+CURVE_DTYPE = np.float32
+
+
+def write_columns(path, columns):
+    """Saves a dict of equally long arrays as one .npy file per column."""
+    os.makedirs(path, exist_ok=True)
+    for name, values in columns.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.asarray(values))
+
+
+def read_columns(path, columns=None):
+    """Memory-maps the columns saved by write_columns (all of them by default)."""
+    if columns is None:
+        columns = sorted(file[:-4] for file in os.listdir(path) if file.endswith(".npy"))
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in columns}
+
+
+def scenario_path(name, results_dir=RESULTS_DIR):
+    return os.path.join(results_dir, name)
+
+
+def write_scenario(data, name, results_dir=RESULTS_DIR):
+    """
+    Writes the output of utils.plotter.compute_plot_data for one scenario.
+
+    The scenario directory is built next to its final location and swapped in
+    at the end, so readers never see a half-written scenario.
+    """
+    path = scenario_path(name, results_dir)
+    tmp_path = scenario_path(f".{name}.tmp", results_dir)
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    bounds = [data["ci_normal"], data["ci_exact"], data["ci_bayesian"], data["hdr_bayesian"]]
+    write_columns(os.path.join(tmp_path, "intervals"), {
+        "method": np.array(INTERVAL_METHODS),
+        "lower": np.array([lower for lower, _ in bounds]),
+        "upper": np.array([upper for _, upper in bounds]),
+    })
+    write_columns(os.path.join(tmp_path, "curves"), {
+        f"{plot}_{axis}": np.asarray(values, dtype=CURVE_DTYPE)
+        for plot, curve in data["curves"].items()
+        for axis, values in zip("xy", curve)
+    })
+    meta = {key: value for key, value in data.items() if key not in ("curves", "ci_normal", "ci_exact", "ci_bayesian", "hdr_bayesian")}
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    swap_directory(tmp_path, path)
+
+
+def swap_directory(tmp_path, path):
+    """Moves a fully written directory to path, replacing any previous version."""
+    head, tail = os.path.split(path)
+    old_path = os.path.join(head, f".{tail}.old")
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def read_scenario(name, results_dir=RESULTS_DIR):
+    """
+    Reads a scenario back in the compute_plot_data format, with memory-mapped curves.
+
+    The result can be passed to utils.plotter.build_figures directly.
+    """
+    path = scenario_path(name, results_dir)
+    with open(os.path.join(path, "meta.json")) as f:
+        data = json.load(f)
+    data["zoom"] = tuple(data["zoom"])
+
+    intervals = read_columns(os.path.join(path, "intervals"))
+    for method, key in zip(INTERVAL_METHODS, ("ci_normal", "ci_exact", "ci_bayesian", "hdr_bayesian")):
+        row = int(np.flatnonzero(intervals["method"] == method)[0])
+        data[key] = (float(intervals["lower"][row]), float(intervals["upper"][row]))
+
+    curves = read_columns(os.path.join(path, "curves"))
+    data["curves"] = {
+        plot: (curves[f"{plot}_x"], curves[f"{plot}_y"])
+        for plot in sorted({column.rsplit("_", 1)[0] for column in curves})
+    }
+    return data
+
+
+def list_scenarios(results_dir=RESULTS_DIR):
+    """Names of the scenarios present in the store."""
+    if not os.path.isdir(results_dir):
+        return []
+    return sorted(
+        entry for entry in os.listdir(results_dir)
+        if not entry.startswith(".") and os.path.exists(os.path.join(results_dir, entry, "meta.json"))
+    )
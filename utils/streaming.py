@@ -0,0 +1,194 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from scipy.stats import beta
+from utils.calculations import JEFFREYS_PRIOR, beta_hdr
+
+
+class PosteriorStream:
+    """
+    Beta posterior state of many portfolios, updated incrementally from Bernoulli events.
+
+    Each portfolio keeps its number of observations and defaults, so an update
+    costs O(chunk) instead of recomputing from the full history:
+    alpha = alpha_0 + defaults, beta = beta_0 + non-defaults.
+    """
+
+    def __init__(self, prior=JEFFREYS_PRIOR, confidence_level=0.95):
+        self.prior = tuple(prior)
+        self.confidence_level = confidence_level
+        self.portfolio_ids = np.empty(0, dtype=str)
+        self.observations = np.zeros(0, dtype=np.int64)
+        self.defaults = np.zeros(0, dtype=np.int64)
+        # Position in the source (bytes for files, events for iterators) covered by the state
+        self.offset = 0
+        self._rows = {}
+
+    def _row_indices(self, portfolio_ids):
+        """Rows of the given portfolios, adding new portfolios at the end."""
+        new_ids = [portfolio_id for portfolio_id in portfolio_ids if portfolio_id not in self._rows]
+        if new_ids:
+            start = len(self.portfolio_ids)
+            self._rows.update((portfolio_id, start + i) for i, portfolio_id in enumerate(new_ids))
+            self.portfolio_ids = np.concatenate([self.portfolio_ids, np.array(new_ids, dtype=str)])
+            self.observations = np.concatenate([self.observations, np.zeros(len(new_ids), dtype=np.int64)])
+            self.defaults = np.concatenate([self.defaults, np.zeros(len(new_ids), dtype=np.int64)])
+        return np.array([self._rows[portfolio_id] for portfolio_id in portfolio_ids], dtype=np.int64)
+
+    def update(self, portfolio_ids, default_flags):
+        """Adds a chunk of (portfolio_id, default_flag) events. Returns the ids of the updated portfolios."""
+        default_flags = np.asarray(default_flags)
+        if not np.isin(default_flags, (0, 1)).all():
+            raise ValueError("default_flag must be 0 or 1")
+        unique_ids, inverse = np.unique(np.asarray(portfolio_ids, dtype=str), return_inverse=True)
+        rows = self._row_indices(unique_ids.tolist())
+        self.observations[rows] += np.bincount(inverse, minlength=len(unique_ids))
+        self.defaults[rows] += np.bincount(inverse, weights=default_flags, minlength=len(unique_ids)).astype(np.int64)
+        return unique_ids
+
+    def intervals(self, portfolio_ids=None):
+        """Equal-tailed and HDR credible intervals of the given portfolios (all by default), as columns."""
+        rows = np.arange(len(self.portfolio_ids)) if portfolio_ids is None else self._row_indices(list(portfolio_ids))
+        alpha_post = self.prior[0] + self.defaults[rows]
+        beta_post = self.prior[1] + self.observations[rows] - self.defaults[rows]
+        tail = (1 - self.confidence_level) / 2
+        lower = beta.ppf(tail, alpha_post, beta_post)
+        upper = beta.ppf(1 - tail, alpha_post, beta_post)
+        hdr_lower, hdr_upper = beta_hdr(alpha_post, beta_post, self.confidence_level, (lower, upper))
+        return {
+            "portfolio_id": self.portfolio_ids[rows],
+            "n": self.observations[rows],
+            "k": self.defaults[rows],
+            "lower": lower,
+            "upper": upper,
+            "hdr_lower": hdr_lower,
+            "hdr_upper": hdr_upper,
+        }
+
+    def save(self, path):
+        """Checkpoints the state atomically."""
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            portfolio_ids=self.portfolio_ids,
+            observations=self.observations,
+            defaults=self.defaults,
+            offset=self.offset,
+            prior=np.array(self.prior),
+            confidence_level=self.confidence_level,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Restores a checkpoint written by save()."""
+        with np.load(path) as checkpoint:
+            stream = cls(tuple(checkpoint["prior"]), float(checkpoint["confidence_level"]))
+            stream.portfolio_ids = checkpoint["portfolio_ids"]
+            stream.observations = checkpoint["observations"]
+            stream.defaults = checkpoint["defaults"]
+            stream.offset = int(checkpoint["offset"])
+        stream._rows = {portfolio_id: row for row, portfolio_id in enumerate(stream.portfolio_ids.tolist())}
+        return stream
+
+
+def iter_chunks(events, chunk_size=100_000, skip=0):
+    """Groups an iterator of (portfolio_id, default_flag) pairs into chunks, skipping the first `skip` events."""
+    offset = 0
+    chunk = []
+    for event in events:
+        offset += 1
+        if offset <= skip:
+            continue
+        chunk.append(event)
+        if len(chunk) == chunk_size:
+            ids, flags = zip(*chunk)
+            yield np.array(ids, dtype=str), np.array(flags, dtype=np.int64), offset
+            chunk = []
+    if chunk:
+        ids, flags = zip(*chunk)
+        yield np.array(ids, dtype=str), np.array(flags, dtype=np.int64), offset
+
+
+def tail_file(path, offset=0, chunk_bytes=1 << 20, follow=False, poll_interval=1.0, header=True):
+    """
+    Reads "portfolio_id,default_flag" lines from a CSV file starting at a byte offset.
+
+    Yields (portfolio_ids, default_flags, new_offset) chunks. Only complete
+    lines are consumed, so new_offset is always a safe restart point. With
+    follow=True the file is polled for appended lines forever, like `tail -f`.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        pending = b""
+        while True:
+            data = f.read(chunk_bytes)
+            if not data:
+                if not follow:
+                    return
+                time.sleep(poll_interval)
+                continue
+            data = pending + data
+            end = data.rfind(b"\n") + 1
+            pending = data[end:]
+            lines = data[:end].decode().splitlines()
+            if header and offset == 0 and lines:
+                lines = lines[1:]
+            offset += end
+            rows = [line.split(",") for line in lines if line]
+            if rows:
+                ids, flags = zip(*rows)
+                yield np.array(ids, dtype=str), np.array(flags, dtype=np.int64), offset
+
+
+def stream_intervals(stream, chunks, emit_every=100_000, checkpoint_path=None):
+    """
+    Feeds chunks into a PosteriorStream and yields updated intervals at a fixed cadence.
+
+    Every emit_every events, the intervals of the portfolios updated since the
+    previous emission are yielded (as columns) and the state is
+    checkpointed, so a restart resumes from the last emission.
+    """
+    updated = set()
+    since_emit = 0
+    for portfolio_ids, default_flags, offset in chunks:
+        updated.update(stream.update(portfolio_ids, default_flags).tolist())
+        stream.offset = offset
+        since_emit += len(portfolio_ids)
+        if since_emit >= emit_every:
+            if checkpoint_path:
+                stream.save(checkpoint_path)
+            yield stream.intervals(sorted(updated))
+            updated.clear()
+            since_emit = 0
+    if updated:
+        if checkpoint_path:
+            stream.save(checkpoint_path)
+        yield stream.intervals(sorted(updated))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream default events and print updated Jeffreys posterior intervals.")
+    parser.add_argument("path", help="CSV file of portfolio_id,default_flag lines (with a header)")
+    parser.add_argument("--checkpoint", help="state file to resume from and update")
+    parser.add_argument("--emit-every", type=int, default=100_000, help="events between two emissions")
+    parser.add_argument("--confidence-level", type=float, help="default: the checkpoint's level, or 0.95")
+    parser.add_argument("--follow", action="store_true", help="keep reading lines appended to the file")
+    args = parser.parse_args()
+
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        posterior_stream = PosteriorStream.load(args.checkpoint)
+        # The state holds counts only, so a resumed stream can switch level
+        if args.confidence_level is not None:
+            posterior_stream.confidence_level = args.confidence_level
+    else:
+        posterior_stream = PosteriorStream(confidence_level=args.confidence_level or 0.95)
+
+    print("portfolio_id,n,k,lower,upper,hdr_lower,hdr_upper")
+    chunk_source = tail_file(args.path, posterior_stream.offset, follow=args.follow)
+    for columns in stream_intervals(posterior_stream, chunk_source, args.emit_every, args.checkpoint):
+        for row in zip(*columns.values()):
+            print(",".join(str(value) for value in row))
+        sys.stdout.flush()
@@ -0,0 +1,131 @@
+import argparse
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+from utils.calculations import _as_batch, compute_intervals
+
+# Precomputed bounds of every method for k = 0..n, one memory-mapped array per (n, level):
+#   tables/n=<n>_level=<level>.npy with shape (n + 1, len(BOUND_COLUMNS))
+TABLES_DIR = "tables"
+STANDARD_SIZES = (100, 250, 500, 1000, 2500, 5000, 10_000, 100_000)
+STANDARD_LEVELS = (0.90, 0.95, 0.99, 0.999)
+BOUND_COLUMNS = (
+    "wald_lower", "wald_upper",
+    "cp_lower", "cp_upper",
+    "jeffreys_lower", "jeffreys_upper",
+    "hdr_lower", "hdr_upper",
+)
+BUILD_CHUNK = 50_000
+
+
+def table_name(n, confidence_level):
+    # repr() round-trips floats exactly, so only the exact tabulated level maps to a table
+    return f"n={int(n)}_level={float(confidence_level)!r}.npy"
+
+
+def build_table(n, confidence_level, tables_dir=TABLES_DIR, chunk_size=BUILD_CHUNK):
+    """Computes the bounds of every k = 0..n and saves them as a memory-mappable array."""
+    os.makedirs(tables_dir, exist_ok=True)
+    path = os.path.join(tables_dir, table_name(n, confidence_level))
+    tmp_path = f"{path}.tmp"
+    table = open_memmap(tmp_path, mode="w+", dtype=np.float64, shape=(n + 1, len(BOUND_COLUMNS)))
+    for start in range(0, n + 1, chunk_size):
+        k = np.arange(start, min(start + chunk_size, n + 1))
+        columns = compute_intervals(n, k, confidence_level)
+        table[start:start + len(k)] = np.column_stack([columns[name] for name in BOUND_COLUMNS])
+    table.flush()
+    del table
+    os.replace(tmp_path, path)
+    return path
+
+
+def build_tables(sizes=STANDARD_SIZES, levels=STANDARD_LEVELS, tables_dir=TABLES_DIR):
+    """Builds the table of every (n, level) pair."""
+    for n in sizes:
+        for confidence_level in levels:
+            print(f"Building {build_table(n, confidence_level, tables_dir)}")
+
+
+class IntervalTables:
+    """
+    Looks interval bounds up in the precomputed tables.
+
+    lookup() takes the same arguments as compute_intervals and returns the same
+    columns. A table is used only for an integer n and k and a level exactly
+    equal to the tabulated one; everything else is computed live.
+    """
+
+    def __init__(self, tables_dir=TABLES_DIR):
+        self.tables_dir = tables_dir
+        self._tables = {}
+        self._available = set()
+        if os.path.isdir(tables_dir):
+            self._available = {file for file in os.listdir(tables_dir) if file.endswith(".npy")}
+
+    def table(self, n, confidence_level):
+        """Memory-mapped table of (n, level), or None when it was not built."""
+        name = table_name(n, confidence_level)
+        if name not in self._available:
+            return None
+        if name not in self._tables:
+            self._tables[name] = np.load(os.path.join(self.tables_dir, name), mmap_mode="r")
+        return self._tables[name]
+
+    def preload(self):
+        """Memory-maps every available table up front."""
+        for name in self._available:
+            if name not in self._tables:
+                self._tables[name] = np.load(os.path.join(self.tables_dir, name), mmap_mode="r")
+
+    def lookup(self, n, k, confidence_level=0.95):
+        n, k, confidence_level = _as_batch(n, k, confidence_level)
+        shape = n.shape
+        n, k, confidence_level = n.ravel(), k.ravel(), confidence_level.ravel()
+        bounds = np.empty((len(n), len(BOUND_COLUMNS)))
+        live = np.ones(len(n), dtype=bool)
+
+        if self._available:
+            integer_k = k == np.round(k)
+            pairs, inverse = np.unique(np.column_stack([n, confidence_level]), axis=0, return_inverse=True)
+            for i, (table_n, table_level) in enumerate(pairs):
+                if table_n != np.round(table_n):
+                    continue
+                table = self.table(table_n, table_level)
+                if table is None:
+                    continue
+                rows = (inverse.ravel() == i) & integer_k
+                bounds[rows] = table[k[rows].astype(np.int64)]
+                live[rows] = False
+
+        if live.any():
+            columns = compute_intervals(n[live], k[live], confidence_level[live])
+            bounds[live] = np.column_stack([columns[name] for name in BOUND_COLUMNS])
+
+        result = {"n": n, "k": k, "confidence_level": confidence_level, "p_hat": k / n}
+        result.update((name, bounds[:, i]) for i, name in enumerate(BOUND_COLUMNS))
+        return {name: values.reshape(shape) for name, values in result.items()}
+
+
+_default_tables = None
+
+
+def default_tables():
+    """The IntervalTables of TABLES_DIR, opened on first use."""
+    global _default_tables
+    if _default_tables is None:
+        _default_tables = IntervalTables()
+    return _default_tables
+
+
+def lookup_intervals(n, k, confidence_level=0.95):
+    """compute_intervals backed by the tables in TABLES_DIR."""
+    return default_tables().lookup(n, k, confidence_level)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the interval lookup tables.")
+    parser.add_argument("--size", type=int, action="append", help="portfolio size to tabulate, repeatable (default: standard sizes)")
+    parser.add_argument("--level", type=float, action="append", help="confidence level, repeatable (default: 90/95/99/99.9%%)")
+    parser.add_argument("--tables-dir", default=TABLES_DIR)
+    args = parser.parse_args()
+    build_tables(args.size or STANDARD_SIZES, args.level or STANDARD_LEVELS, args.tables_dir)